@@ -0,0 +1,141 @@
+"""
+Spending analytics for a group and for one user across their groups.
+
+Every figure is a grouped SUM/COUNT in the database, so a response costs a
+handful of queries returning at most one row per member, month or item name,
+however many items the group has. Items are counted as paid by their creator
+and consumed by their split participants; a gift (payer outside the split)
+counts as paid but not consumed.
+
+Instances being deleted (see api.deletion) are left out while their items
+are purged. Results are cached under the group's version, or the versions
+of all the user's groups, so any write makes the next read recompute and
+stale entries simply expire.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Group, GroupMember, Item, ItemSplit
+
+CACHE_TIMEOUT = 60 * 60
+TOP_ITEMS = 10
+
+ZERO = Decimal('0')
+
+
+def _money(amount):
+    return f'{amount or ZERO:.2f}'
+
+
+def _ratio(paid, consumed):
+    """How much of what a member consumed they paid for, None if they consumed nothing"""
+    return round(float(paid / consumed), 4) if consumed else None
+
+
+def _month(value):
+    return value.strftime('%Y-%m')
+
+
+def _cached(key, compute):
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def group_analytics(group):
+    """Per-member spend, monthly totals and top items of a group"""
+    return _cached(f'analytics:group:{group.id}:{group.version}', lambda: _group_analytics(group.id))
+
+
+def _group_analytics(group_id):
+    items = Item.objects.filter(instance__group_id=group_id, instance__is_deleting=False)
+    paid = dict(items.order_by().values_list('created_by_id').annotate(total=Sum('price')))
+    consumed = dict(
+        ItemSplit.objects.filter(item__instance__group_id=group_id, item__instance__is_deleting=False)
+        .order_by().values_list('user_id').annotate(total=Sum('amount'))
+    )
+    members = []
+    for user_id in GroupMember.objects.filter(group_id=group_id).order_by('user_id').values_list('user_id', flat=True):
+        member_paid, member_consumed = paid.get(user_id, ZERO), consumed.get(user_id, ZERO)
+        members.append({
+            'user_id': user_id,
+            'paid': _money(member_paid),
+            'consumed': _money(member_consumed),
+            'ratio': _ratio(member_paid, member_consumed),
+        })
+
+    months = (
+        items.annotate(month=TruncMonth('instance__date')).order_by('month')
+        .values_list('month').annotate(total=Sum('price'), count=Count('id'))
+    )
+    top_items = items.order_by().values_list('name').annotate(
+        total=Sum('price'), count=Count('id')
+    ).order_by('-total', 'name')[:TOP_ITEMS]
+
+    return {
+        'group': group_id,
+        'total_spend': _money(sum(paid.values(), ZERO)),
+        'members': members,
+        'months': [{'month': _month(month), 'total': _money(total), 'items': count} for month, total, count in months],
+        'top_items': [{'name': name, 'total': _money(total), 'count': count} for name, total, count in top_items],
+    }
+
+
+def user_analytics(user):
+    """What a user paid and consumed in each of their groups and each month"""
+    versions = list(
+        GroupMember.objects.filter(user=user, group__is_deleting=False)
+        .order_by('group_id').values_list('group_id', 'group__version')
+    )
+    digest = hashlib.sha1(repr(versions).encode()).hexdigest()
+    return _cached(f'analytics:user:{user.pk}:{digest}', lambda: _user_analytics(user.pk, [g for g, _ in versions]))
+
+
+def _user_analytics(user_id, group_ids):
+    paid_items = Item.objects.filter(
+        instance__group_id__in=group_ids, instance__is_deleting=False, created_by_id=user_id
+    )
+    splits = ItemSplit.objects.filter(
+        item__instance__group_id__in=group_ids, item__instance__is_deleting=False, user_id=user_id
+    )
+
+    paid = dict(paid_items.order_by().values_list('instance__group_id').annotate(total=Sum('price')))
+    consumed = dict(splits.order_by().values_list('item__instance__group_id').annotate(total=Sum('amount')))
+    names = dict(Group.objects.filter(id__in=group_ids).values_list('id', 'name'))
+    groups = [
+        {
+            'group': group_id,
+            'name': names[group_id],
+            'paid': _money(paid.get(group_id)),
+            'consumed': _money(consumed.get(group_id)),
+            'ratio': _ratio(paid.get(group_id, ZERO), consumed.get(group_id, ZERO)),
+        }
+        for group_id in group_ids
+    ]
+
+    months = {}
+    for field, rows in (
+        ('paid', paid_items.annotate(month=TruncMonth('instance__date')).order_by().values_list('month').annotate(total=Sum('price'))),
+        ('consumed', splits.annotate(month=TruncMonth('item__instance__date')).order_by().values_list('month').annotate(total=Sum('amount'))),
+    ):
+        for month, total in rows:
+            months.setdefault(month, {'paid': ZERO, 'consumed': ZERO})[field] = total
+
+    total_paid, total_consumed = sum(paid.values(), ZERO), sum(consumed.values(), ZERO)
+    return {
+        'user': user_id,
+        'paid': _money(total_paid),
+        'consumed': _money(total_consumed),
+        'ratio': _ratio(total_paid, total_consumed),
+        'groups': groups,
+        'months': [
+            {'month': _month(month), 'paid': _money(totals['paid']), 'consumed': _money(totals['consumed'])}
+            for month, totals in sorted(months.items())
+        ],
+    }
@@ -0,0 +1,122 @@
+"""
+Async variants of the dashboard read endpoints, served under /api/async/.
+
+Under ASGI (splitsmart/asgi.py) these run on the event loop: a cached token is
+checked in memory, a fresh one is verified in a worker thread, and queries go
+through Django's async ORM, so a request waiting on Firebase or the database
+doesn't hold a worker thread. Responses, filters, ETags, response caching
+and ?page_size= cursors match the DRF endpoints of the same name. They also work under WSGI,
+just without the benefit.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import FirebaseAuthentication
+from .etags import add_etag, agroup_versions_etag, cache_key, not_modified, response_cache
+from .filters import QueryParamFilter
+from .pagination import InstancePagination, KeysetPagination
+from .routers import apinned_to_primary, replica_configured, replica_reads
+from .serializers import BalanceSerializer, GroupSerializer, InstanceSerializer
+from .views import balance_queryset, group_queryset, instance_queryset
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+class AsyncReadView(View):
+    http_method_names = ['get', 'head', 'options']
+    # Every subclass names the function that scopes its rows to a user, e.g. views.group_queryset
+    queryset_for = None
+    serializer_class = None
+    pagination_class = None
+    filter_lookups = {}
+    authenticator = FirebaseAuthentication()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.queryset_for is None or cls.serializer_class is None:
+            raise TypeError(f'{cls.__name__} must set queryset_for and serializer_class')
+
+    async def get(self, request, pk=None):
+        # Same answers as DRF gives without a WWW-Authenticate header
+        try:
+            user_auth = await self.authenticator.aauthenticate(request)
+        except exceptions.AuthenticationFailed as exc:
+            return render({'detail': exc.detail}, status.HTTP_403_FORBIDDEN)
+        if user_auth is None:
+            return render({'detail': exceptions.NotAuthenticated.default_detail}, status.HTTP_403_FORBIDDEN)
+        request.user = user = user_auth[0]
+
+        # Same replica routing as the DRF list/retrieve endpoints, see api.routers
+        with replica_reads(replica_configured() and not await apinned_to_primary(user.pk)):
+            return await self.read(request, user, pk)
+
+    async def read(self, request, user, pk):
+        etag = await agroup_versions_etag(user, f'{request.get_full_path()}|application/json')
+        if not_modified(request, etag):
+            return add_etag(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), etag)
+        cached = await response_cache().aget(cache_key(etag))
+        if cached is not None:
+            return add_etag(render(cached), etag)
+
+        async def ok(data):
+            await response_cache().aset(cache_key(etag), data)
+            return add_etag(render(data), etag)
+
+        queryset = self.queryset_for(user)
+        if pk is not None:
+            obj = await queryset.filter(pk=pk).afirst()
+            if obj is None:
+                return render({'detail': exceptions.NotFound.default_detail}, status.HTTP_404_NOT_FOUND)
+            return await ok(self.serializer_class(obj).data)
+
+        drf_request = Request(request)
+        try:
+            queryset = QueryParamFilter().filter_queryset(drf_request, queryset, self)
+        except exceptions.ValidationError as exc:
+            return render(exc.detail, status.HTTP_400_BAD_REQUEST)
+
+        paginator = self.pagination_class() if self.pagination_class else None
+        if paginator is None or paginator.get_page_size(drf_request) is None:
+            rows = [obj async for obj in queryset]
+            return await ok(self.serializer_class(rows, many=True).data)
+
+        # CursorPagination evaluates the page itself; keep its cursor format
+        try:
+            page = await sync_to_async(paginator.paginate_queryset)(queryset, drf_request, self)
+        except exceptions.NotFound as exc:
+            return render({'detail': exc.detail}, status.HTTP_404_NOT_FOUND)
+        return await ok({
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': self.serializer_class(page, many=True).data,
+        })
+
+
+class AsyncGroupView(AsyncReadView):
+    queryset_for = staticmethod(group_queryset)
+    serializer_class = GroupSerializer
+
+
+class AsyncInstanceView(AsyncReadView):
+    queryset_for = staticmethod(instance_queryset)
+    serializer_class = InstanceSerializer
+    pagination_class = InstancePagination
+    filter_lookups = {
+        'group': 'group_id',
+        'created_by': 'created_by_id',
+        'date_after': 'date__gte',
+        'date_before': 'date__lte',
+    }
+
+
+class AsyncBalanceView(AsyncReadView):
+    queryset_for = staticmethod(balance_queryset)
+    serializer_class = BalanceSerializer
+    pagination_class = KeysetPagination
+    filter_lookups = {'group': 'group_id'}
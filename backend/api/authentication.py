@@ -1,13 +1,47 @@
-import firebase_admin
-from firebase_admin import credentials, auth
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
 from rest_framework import authentication
 from rest_framework import exceptions
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate(settings.FIREBASE_CONFIG)
-firebase_admin.initialize_app(cred)
+from .instrumentation import timer
+
+ID_TOKEN_CERT_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+ID_TOKEN_ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+_firebase_lock = threading.Lock()
+
+
+def firebase_app():
+    """
+    The Firebase Admin app, initialized on first use.
+
+    Importing the SDK and reading the service account key are left out of
+    module import so a cold serverless instance doesn't pay for them before
+    it needs them; cached tokens never do.
+    """
+    import firebase_admin
+
+    with _firebase_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            from firebase_admin import credentials
+
+            return firebase_admin.initialize_app(credentials.Certificate(settings.FIREBASE_CONFIG))
+
 
 # Add this to wherever you create/sync Django users from Firebase
 # This ensures the username field matches the email
@@ -31,18 +65,219 @@ def get_or_create_user_from_firebase(firebase_user):
         )
         return user
 
+
+class CertificateCache:
+    """
+    Google's ID token signing certificates.
+
+    The first call fetches them; afterwards a daemon timer refetches them
+    shortly before the max-age Google advertises runs out, so requests never
+    wait on the certificate endpoint.
+    """
+
+    def __init__(self, url=ID_TOKEN_CERT_URL, refresh_margin=300, fallback_max_age=3600):
+        self.url = url
+        self.refresh_margin = refresh_margin
+        self.fallback_max_age = fallback_max_age
+        self._certs = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def get(self):
+        if self._certs is None or time.time() >= self._expires_at:
+            with self._lock:
+                if self._certs is None or time.time() >= self._expires_at:
+                    self._fetch()
+        return self._certs
+
+    def _fetch(self):
+        from google.auth.transport.requests import Request
+
+        response = Request()(self.url, method='GET')
+        if response.status != 200:
+            raise exceptions.AuthenticationFailed('Could not fetch token signing certificates')
+
+        max_age = self.fallback_max_age
+        match = re.search(r'max-age=(\d+)', response.headers.get('cache-control', ''))
+        if match:
+            max_age = int(match.group(1))
+
+        data = response.data.decode('utf-8') if isinstance(response.data, bytes) else response.data
+        self._certs = json.loads(data)
+        self._expires_at = time.time() + max_age
+        self._schedule_refresh(max(max_age - self.refresh_margin, 60))
+
+    def _schedule_refresh(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def prefetch(self):
+        """Warm the cache ahead of the first request"""
+        try:
+            self.get()
+        except Exception:
+            pass
+
+    def _refresh(self):
+        try:
+            with self._lock:
+                self._fetch()
+        except Exception:
+            # Keep serving the current certificates; get() refetches once they expire
+            self._schedule_refresh(60)
+
+
+certificates = CertificateCache()
+if getattr(settings, 'FIREBASE_PREFETCH_CERTIFICATES', False):
+    threading.Thread(target=certificates.prefetch, daemon=True).start()
+
+
+def verify_firebase_token(id_token):
+    """
+    Verify a Firebase ID token against the cached signing certificates.
+
+    Performs the same checks as firebase_admin.auth.verify_id_token: an RS256
+    signature by the certificate the header's `kid` names, expiry, audience
+    and issuer for this project, and a subject.
+    """
+    from google.auth import jwt
+
+    header = jwt.decode_header(id_token)
+    # jwt.decode would accept any algorithm it supports and try every certificate
+    if header.get('alg') != 'RS256':
+        raise ValueError('Token has an incorrect algorithm')
+    certs = certificates.get()
+    kid = header.get('kid')
+    if not isinstance(kid, str) or kid not in certs:
+        raise ValueError('Token has no known key id')
+
+    project_id = firebase_app().project_id
+    claims = jwt.decode(id_token, certs={kid: certs[kid]}, audience=project_id)
+    if claims.get('iss') != ID_TOKEN_ISSUER_PREFIX + project_id:
+        raise ValueError('Token has an incorrect issuer')
+    subject = claims.get('sub')
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError('Token has an invalid subject')
+    claims['uid'] = subject
+    return claims
+
+
+@lru_cache(maxsize=None)
+def _load_verifier(path):
+    return import_string(path)
+
+
+def get_token_verifier():
+    """The callable that turns an ID token into claims, see FIREBASE_TOKEN_VERIFIER"""
+    return _load_verifier(getattr(settings, 'FIREBASE_TOKEN_VERIFIER', 'api.authentication.verify_firebase_token'))
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified tokens.
+
+    Keys are SHA-256 digests of the raw token so tokens are never held in
+    memory. Each entry keeps the decoded claims and the resolved user until
+    the token's own `exp`.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(id_token):
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def get(self, id_token):
+        key = self.key(id_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, claims, user = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims, user
+
+    def set(self, id_token, claims, user):
+        expires_at = claims.get('exp')
+        if not expires_at or expires_at <= time.time():
+            return
+        key = self.key(id_token)
+        with self._lock:
+            self._entries[key] = (expires_at, claims, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (_, _, user) in self._entries.items() if user.id == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(getattr(settings, 'FIREBASE_TOKEN_CACHE_SIZE', 1024))
+
+
+@receiver([post_save, post_delete], sender=User)
+def _forget_cached_user(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.id)
+
+
 class FirebaseAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
+        with timer('auth'):
+            return self._authenticate(request)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views.
+
+        Cache hits are answered on the event loop; verification and the user
+        lookup run in a worker thread so a slow verification blocks nobody else.
+        """
+        id_token = self._token(request)
+        if id_token is None:
+            return None
+        cached = token_cache.get(id_token)
+        if cached is not None:
+            return (copy.copy(cached[1]), None)
+        return await sync_to_async(self.authenticate)(request)
+
+    @staticmethod
+    def _token(request):
         auth_header = request.META.get('HTTP_AUTHORIZATION')
         if not auth_header:
             return None
-        
-        id_token = auth_header.split(' ').pop()
+        return auth_header.split(' ').pop()
+
+    def _authenticate(self, request):
+        id_token = self._token(request)
+        if id_token is None:
+            return None
+
+        cached = token_cache.get(id_token)
+        if cached is not None:
+            # Hand out a copy so one request can't mutate another's user
+            return (copy.copy(cached[1]), None)
+
         try:
-            decoded_token = auth.verify_id_token(id_token)
+            decoded_token = get_token_verifier()(id_token)
             uid = decoded_token['uid']
             email = decoded_token.get('email', '')
-            
+
             # Get or create user
             try:
                 user = User.objects.get(username=uid)
@@ -52,7 +287,7 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
                     email=email,
                     password=None  # No password since using Firebase
                 )
-                
+
                 # Update profile info if available
                 if 'name' in decoded_token:
                     name_parts = decoded_token['name'].split(' ', 1)
@@ -60,7 +295,8 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
                     if len(name_parts) > 1:
                         user.last_name = name_parts[1]
                     user.save()
-            
-            return (user, None)
+
+            token_cache.set(id_token, decoded_token, user)
+            return (copy.copy(user), None)
         except Exception as e:
-            raise exceptions.AuthenticationFailed(f'Invalid token: {str(e)}')
\ No newline at end of file
+            raise exceptions.AuthenticationFailed(f'Invalid token: {str(e)}')
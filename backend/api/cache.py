@@ -0,0 +1,75 @@
+"""
+Cache backend for rendered read responses.
+
+Django's LocMemCache already evicts least recently used entries, but only by
+count, and response bodies range from a few hundred bytes to megabytes.
+SizedLocMemCache bounds the bytes held as well: OPTIONS MAX_BYTES (default
+64 MiB) per process, evicting from the least recently used end until a new
+entry fits. Entries larger than MAX_BYTES are not stored at all.
+"""
+from threading import Lock
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+# Shared by every thread's instance of a cache, like LocMemCache's own storage
+_usage = {}
+_usage_lock = Lock()
+
+
+class _Usage:
+
+    def __init__(self):
+        self.sizes = {}
+        self.total = 0
+
+
+class SizedLocMemCache(LocMemCache):
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_bytes = int(params.get('OPTIONS', {}).get('MAX_BYTES', 64 * 1024 * 1024))
+        with _usage_lock:
+            self._usage = _usage.setdefault(name, _Usage())
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._delete(key)
+        if len(value) > self._max_bytes:
+            return
+        while self._cache and self._usage.total + len(value) > self._max_bytes:
+            self._pop_oldest()
+        super()._set(key, value, timeout)
+        self._usage.sizes[key] = len(value)
+        self._usage.total += len(value)
+
+    def _pop_oldest(self):
+        # New and recently read keys sit at the front, see LocMemCache.get()
+        key, _ = self._cache.popitem()
+        del self._expire_info[key]
+        self._usage.total -= self._usage.sizes.pop(key, 0)
+
+    def _cull(self):
+        if self._cull_frequency == 0:
+            self._clear()
+        else:
+            for _ in range(len(self._cache) // self._cull_frequency):
+                self._pop_oldest()
+
+    def _delete(self, key):
+        self._usage.total -= self._usage.sizes.pop(key, 0)
+        return super()._delete(key)
+
+    def _clear(self):
+        self._cache.clear()
+        self._expire_info.clear()
+        self._usage.sizes.clear()
+        self._usage.total = 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    @property
+    def size(self):
+        """Bytes currently held"""
+        return self._usage.total
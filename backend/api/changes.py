@@ -0,0 +1,39 @@
+"""
+Recording of the change feed served by /api/sync/.
+
+Every write path calls one of these helpers inside its transaction. Deleting
+a row implies deleting its children (a deleted item takes its splits with
+it), so only the top-most deleted row gets a tombstone. Each call also bumps
+the group's version, which the read endpoints turn into ETags.
+"""
+from django.db.models import F
+
+from .models import ChangeLog, Group
+
+
+def bump_version(group_id):
+    Group.objects.filter(id=group_id).update(version=F('version') + 1)
+
+
+def record(group_id, model, object_ids, deleted=False):
+    """Log that rows of `model` in a group were created/updated, or deleted"""
+    ChangeLog.objects.bulk_create([
+        ChangeLog(group_id=group_id, model=model, object_id=object_id, deleted=deleted)
+        for object_id in object_ids
+    ])
+    bump_version(group_id)
+
+
+def record_balances(group_id):
+    """Log that a group's balances changed; clients refetch that group's set"""
+    ChangeLog.objects.create(group_id=group_id, model=ChangeLog.BALANCE)
+    bump_version(group_id)
+
+
+def record_access_lost(group_id, user_ids):
+    """Tombstone a group for users who can no longer see it"""
+    ChangeLog.objects.bulk_create([
+        ChangeLog(group_id=group_id, user_id=user_id, model=ChangeLog.GROUP, object_id=group_id, deleted=True)
+        for user_id in user_ids
+    ])
+    bump_version(group_id)
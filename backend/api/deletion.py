@@ -0,0 +1,120 @@
+"""
+Chunked deletion of groups and instances.
+
+Django's cascade collector loads every related object before deleting and
+does it all in one transaction, which for a large group means a lot of
+memory and a long write lock. Here children are removed before parents with
+raw DELETEs of bounded primary-key chunks, each in its own short transaction,
+so other requests get the database between chunks.
+
+A group is first marked as deleting and stripped of its members in one quick
+transaction, which hides it from every endpoint and rejects new writes; the
+rows are then purged by a 'purge_group' job (see api.jobs). Instances are
+marked the same way, then their items go chunk by chunk, each chunk taking
+its splits, its share of the balances and of the summary with it.
+`manage.py purge_deleted_groups` finishes purges that were interrupted.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from . import changes, jobs, summary
+from .ledger import add_debt, apply_balance_deltas, reverse_deltas
+from .models import Balance, ChangeLog, Group, GroupMember, Instance, Item, ItemSplit
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+
+
+def delete_in_chunks(queryset, chunk_size=CHUNK_SIZE, before_delete=None):
+    """
+    Delete the rows of `queryset` `chunk_size` primary keys at a time.
+
+    Rows are removed with a raw DELETE: no instances are loaded, no signals
+    sent and nothing cascades, so callers delete children first.
+    `before_delete(chunk)` runs in the chunk's transaction just before it goes.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            chunk = queryset.model.objects.filter(pk__in=ids)
+            if before_delete is not None:
+                before_delete(chunk)
+            deleted += chunk._raw_delete(chunk.db)
+
+
+def mark_group_deleting(group):
+    """Hide a group from its members and stop writes to it; the rows stay until purged"""
+    with transaction.atomic():
+        Group.objects.filter(id=group.id).update(is_deleting=True)
+        # Members lose the group from their feed before the memberships go
+        changes.record_access_lost(
+            group.id, GroupMember.objects.filter(group_id=group.id).values_list('user_id', flat=True)
+        )
+        GroupMember.objects.filter(group_id=group.id).delete()
+
+
+def purge_group(group_id, chunk_size=CHUNK_SIZE):
+    """Delete a group marked as deleting, children first"""
+    counts = {
+        'splits': delete_in_chunks(ItemSplit.objects.filter(item__instance__group_id=group_id), chunk_size),
+        'items': delete_in_chunks(Item.objects.filter(instance__group_id=group_id), chunk_size),
+        'instances': delete_in_chunks(Instance.objects.filter(group_id=group_id), chunk_size),
+        'balances': delete_in_chunks(Balance.objects.filter(group_id=group_id), chunk_size),
+        'members': delete_in_chunks(GroupMember.objects.filter(group_id=group_id), chunk_size),
+    }
+    # Only the group row and its summary are left for the collector
+    with transaction.atomic():
+        Group.objects.filter(id=group_id, is_deleting=True).delete()
+    logger.debug('Purged group %s: %s', group_id, counts)
+    return counts
+
+
+def delete_group(group, user=None):
+    mark_group_deleting(group)
+    return jobs.enqueue('purge_group', {'group_id': group.id}, user)
+
+
+def mark_instance_deleting(instance):
+    """Hide an instance and stop writes to it; its items stay until purged"""
+    with transaction.atomic():
+        Instance.objects.filter(id=instance.id).update(is_deleting=True)
+        changes.record(instance.group_id, ChangeLog.INSTANCE, [instance.id], deleted=True)
+
+
+def purge_instance(instance_id, chunk_size=CHUNK_SIZE):
+    """Delete an instance marked as deleting, undoing its items' balances chunk by chunk"""
+    group_id = Instance.objects.filter(id=instance_id).values_list('group_id', flat=True).first()
+    if group_id is None:
+        return {'splits': 0, 'items': 0}
+    counts = {'splits': 0}
+
+    def forget_items(chunk):
+        splits = ItemSplit.objects.filter(item__in=chunk)
+        deltas = {}
+        for debtor_id, payer_id, total in (
+            splits.exclude(user_id=F('item__created_by_id'))
+            .values_list('user_id', 'item__created_by_id').annotate(total=Sum('amount')).order_by()
+        ):
+            add_debt(deltas, debtor_id, payer_id, total)
+        apply_balance_deltas(group_id, reverse_deltas(deltas))
+        counts['splits'] += splits._raw_delete(splits.db)
+        totals = chunk.aggregate(count=Count('id'), spend=Sum('price'))
+        summary.record_items(group_id, -totals['count'], -(totals['spend'] or 0))
+
+    counts['items'] = delete_in_chunks(Item.objects.filter(instance_id=instance_id), chunk_size, forget_items)
+    with transaction.atomic():
+        if Instance.objects.filter(id=instance_id, is_deleting=True).delete()[0]:
+            summary.record_instances(group_id, -1)
+    return counts
+
+
+def delete_instance(instance, chunk_size=CHUNK_SIZE):
+    """Delete an instance's items and splits in chunks, then the instance itself"""
+    mark_instance_deleting(instance)
+    return purge_instance(instance.id, chunk_size)
@@ -0,0 +1,135 @@
+"""
+Resolution of the user identifiers clients send (ids, usernames, emails).
+
+A whole list is resolved with one query, optionally restricted to the members
+of a group. Username and email mappings seen recently are kept in a small
+per-process LRU so repeat lookups only need the cheap membership check on
+user ids; entries for a user are dropped whenever that user is saved or
+deleted, and expire after a while so other processes' renames catch up.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import GroupMember
+
+LOOKUPS = ('id', 'username', 'email')
+# Largest primary key a signed 64-bit column holds
+MAX_ID = 2 ** 63 - 1
+
+
+class UserDirectory:
+
+    def __init__(self, maxsize=4096, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user_id = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def _set(self, key, user_id):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (_, cached) in self._entries.items() if cached == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def resolve(self, identifiers, group_id=None, lookups=LOOKUPS):
+        """
+        Map identifiers to user ids, trying each of `lookups` in order.
+
+        With `group_id`, only members of that group resolve. Identifiers that
+        match nobody are left out of the result.
+        """
+        identifiers = {str(identifier).strip() for identifier in identifiers} - {''}
+        known, pending = {}, set()
+        for identifier in identifiers:
+            user_id = next(
+                (user_id for user_id in (self._get((kind, identifier)) for kind in lookups) if user_id is not None),
+                None,
+            )
+            if user_id is None:
+                pending.add(identifier)
+            else:
+                known[identifier] = user_id
+
+        condition = Q(id__in=set(known.values()))
+        if 'id' in lookups:
+            condition |= Q(id__in={
+                int(identifier) for identifier in pending
+                # isdigit() alone lets through '²' and ids no database column can hold
+                if identifier.isascii() and identifier.isdigit() and int(identifier) <= MAX_ID
+            })
+        if 'username' in lookups and pending:
+            condition |= Q(username__in=pending)
+        if 'email' in lookups and pending:
+            condition |= Q(email__in=pending)
+
+        users = User.objects.filter(condition)
+        if group_id is not None:
+            users = users.filter(id__in=GroupMember.objects.filter(group_id=group_id).values('user_id'))
+
+        found = {'id': {}, 'username': {}, 'email': {}}
+        for user_id, username, email in users.values_list('id', 'username', 'email').order_by('id'):
+            found['id'][str(user_id)] = user_id
+            found['username'][username] = user_id
+            found['email'].setdefault(email, user_id)
+
+        # A cached mapping only counts if its user came back, i.e. is still a member
+        resolved = {
+            identifier: user_id for identifier, user_id in known.items() if str(user_id) in found['id']
+        }
+        for identifier in pending:
+            for kind in lookups:
+                user_id = found[kind].get(identifier)
+                if user_id is not None:
+                    resolved[identifier] = user_id
+                    self._set((kind, identifier), user_id)
+                    break
+        return resolved
+
+    def resolve_list(self, identifiers, group_id=None):
+        """Resolve a shared_with list to distinct user ids, keeping its order"""
+        resolved = self.resolve(identifiers, group_id)
+        user_ids = []
+        seen = set()
+        for identifier in identifiers:
+            user_id = resolved.get(str(identifier).strip())
+            if user_id is not None and user_id not in seen:
+                seen.add(user_id)
+                user_ids.append(user_id)
+        return user_ids
+
+
+directory = UserDirectory(getattr(settings, 'USER_DIRECTORY_CACHE_SIZE', 4096))
+
+
+@receiver([post_save, post_delete], sender=User)
+def _forget_cached_user(sender, instance, **kwargs):
+    directory.invalidate_user(instance.id)
@@ -0,0 +1,90 @@
+"""
+Conditional GETs for the read endpoints.
+
+Everything these endpoints return lives in one of the user's groups, and
+every write bumps its group's version (see api.changes). The ETag of a
+response is therefore a hash of the user, the versions of all their groups
+and the request itself: one indexed query decides whether a poll can be
+answered with 304 Not Modified before any serializer runs.
+
+The same tag keys the 'responses' cache, so a client without the body, or
+polling for the first time, is served the data another request serialized
+at the same versions. Writes move the versions on, which changes the key;
+nothing is ever invalidated explicitly and old entries just age out.
+"""
+import hashlib
+
+from django.core.cache import caches
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import GroupMember
+
+
+def versions_etag(user_id, request_key, versions):
+    """Strong ETag for `request_key` given the user's [(group_id, version)]"""
+    digest = hashlib.sha1()
+    digest.update(f'{user_id}|{request_key}'.encode())
+    for group_id, version in versions:
+        digest.update(f'|{group_id}:{version}'.encode())
+    return quote_etag(digest.hexdigest())
+
+
+def _versions(user):
+    return GroupMember.objects.filter(user=user).order_by('group_id').values_list('group_id', 'group__version')
+
+
+def group_versions_etag(request):
+    request_key = f'{request.get_full_path()}|{request.accepted_media_type}'
+    return versions_etag(request.user.pk, request_key, _versions(request.user))
+
+
+async def agroup_versions_etag(user, request_key):
+    """group_versions_etag() for async views, see api.async_views"""
+    return versions_etag(user.pk, request_key, [row async for row in _versions(user)])
+
+
+def response_cache():
+    return caches['responses']
+
+
+def cache_key(etag):
+    return 'response:' + etag.strip('"')
+
+
+def not_modified(request, etag):
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+class ConditionalGetMixin:
+    """Adds strong ETags and If-None-Match handling to list and retrieve"""
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
+
+    def conditional(self, request, handler, *args, **kwargs):
+        # Computed before the data is read, so a concurrent write can only make
+        # the tag older than the body, never newer
+        etag = group_versions_etag(request)
+        if not_modified(request, etag):
+            return add_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        data = response_cache().get(cache_key(etag))
+        if data is not None:
+            return add_etag(Response(data), etag)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_cache().set(cache_key(etag), response.data)
+        return add_etag(response, etag)
+
+
+def add_etag(response, etag):
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        # Let browsers keep the body but always revalidate it
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
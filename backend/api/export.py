@@ -0,0 +1,92 @@
+"""
+Streaming export of a group's ledger.
+
+Rows come straight from `.values_list().iterator()` cursors and are encoded a
+chunk at a time, so memory stays flat however large the group is. Instances
+come first, then items, then splits; each record carries the ids of its
+parents.
+"""
+import csv
+import json
+
+from .models import Instance, Item, ItemSplit
+
+CHUNK_SIZE = 2000
+
+COLUMNS = [
+    'record', 'id', 'instance_id', 'item_id', 'name', 'date', 'description',
+    'price', 'amount', 'user_id', 'created_by_id', 'created_at',
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def ledger_records(group_id, chunk_size=CHUNK_SIZE):
+    """Every instance, item and split of a group as dicts keyed by COLUMNS, less instances being deleted"""
+    instances = Instance.objects.filter(group_id=group_id, is_deleting=False).order_by('id').values_list(
+        'id', 'name', 'date', 'description', 'created_by_id', 'created_at'
+    )
+    for pk, name, date, description, created_by_id, created_at in instances.iterator(chunk_size=chunk_size):
+        yield {
+            'record': 'instance', 'id': pk, 'name': name, 'date': date.isoformat(),
+            'description': description, 'created_by_id': created_by_id, 'created_at': created_at.isoformat(),
+        }
+
+    items = Item.objects.filter(instance__group_id=group_id, instance__is_deleting=False).order_by('id').values_list(
+        'id', 'instance_id', 'name', 'price', 'created_by_id', 'created_at'
+    )
+    for pk, instance_id, name, price, created_by_id, created_at in items.iterator(chunk_size=chunk_size):
+        yield {
+            'record': 'item', 'id': pk, 'instance_id': instance_id, 'name': name, 'price': str(price),
+            'created_by_id': created_by_id, 'created_at': created_at.isoformat(),
+        }
+
+    splits = ItemSplit.objects.filter(
+        item__instance__group_id=group_id, item__instance__is_deleting=False
+    ).order_by('id').values_list(
+        'id', 'item_id', 'user_id', 'amount', 'created_at'
+    )
+    for pk, item_id, user_id, amount, created_at in splits.iterator(chunk_size=chunk_size):
+        yield {
+            'record': 'split', 'id': pk, 'item_id': item_id, 'user_id': user_id,
+            'amount': str(amount), 'created_at': created_at.isoformat(),
+        }
+
+
+class _Lines:
+    """File-like sink that hands back whatever csv.writer wrote"""
+
+    def write(self, value):
+        return value
+
+
+def _chunks(lines, chunk_size):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def csv_lines(records):
+    writer = csv.DictWriter(_Lines(), fieldnames=COLUMNS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record) + '\n'
+
+
+def stream_ledger(group_id, kind, chunk_size=CHUNK_SIZE):
+    """Encoded chunks of a group's ledger, `kind` being one of CONTENT_TYPES"""
+    lines = csv_lines if kind == 'csv' else ndjson_lines
+    return _chunks(lines(ledger_records(group_id, chunk_size)), chunk_size)
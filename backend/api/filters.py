@@ -0,0 +1,33 @@
+from django import forms
+from rest_framework import exceptions
+from rest_framework.filters import BaseFilterBackend
+
+# Query parameter -> form field used to parse it
+PARAMETER_FIELDS = {
+    'group': forms.IntegerField(),
+    'created_by': forms.IntegerField(),
+    'date_after': forms.DateField(),
+    'date_before': forms.DateField(),
+}
+
+
+class QueryParamFilter(BaseFilterBackend):
+    """
+    Filter list endpoints by ?group=, ?created_by=, ?date_after= and ?date_before=.
+
+    Each view declares `filter_lookups`, mapping the parameters it supports to
+    ORM lookups on its own model.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        lookups = getattr(view, 'filter_lookups', {})
+        filters = {}
+        for param, lookup in lookups.items():
+            raw = request.query_params.get(param)
+            if raw in (None, ''):
+                continue
+            try:
+                filters[lookup] = PARAMETER_FIELDS[param].clean(raw)
+            except forms.ValidationError as exc:
+                raise exceptions.ValidationError({param: exc.messages})
+        return queryset.filter(**filters) if filters else queryset
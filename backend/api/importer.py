@@ -0,0 +1,206 @@
+"""
+Streaming bulk import of expenses into a group.
+
+Input rows carry an instance name, date, item name, price, payer and
+participants; consecutive rows with the same instance name and date become
+one instance. Rows are read lazily and handled in chunks: each chunk resolves
+its users with one query, validates, bulk-creates its instances, items and
+splits, and applies its balance deltas once, all in one transaction. Invalid
+rows are skipped and reported by line number.
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import changes, jobs, summary
+from .directory import directory
+from .ledger import apply_balance_deltas, item_balance_deltas, split_amount
+from .models import ChangeLog, Group, Instance, Item, ItemSplit
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+COLUMNS = ['instance', 'date', 'item', 'price', 'payer', 'participants', 'description']
+
+FIELDS = {
+    'instance': forms.CharField(max_length=100),
+    'date': forms.DateField(input_formats=['%Y-%m-%d']),
+    'item': forms.CharField(max_length=100),
+    'price': forms.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0')),
+    'payer': forms.CharField(),
+    'description': forms.CharField(required=False),
+}
+
+
+def read_rows(stream, kind):
+    """Yield (line number, raw dict) from a binary or text stream of CSV or NDJSON"""
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if kind == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else {'_error': 'Not a JSON object'}
+
+
+def _participants(value):
+    if isinstance(value, list):
+        return [str(identifier).strip() for identifier in value if str(identifier).strip()]
+    return [identifier.strip() for identifier in str(value or '').split(';') if identifier.strip()]
+
+
+def _clean(raw):
+    """Parse one raw row into a dict, or raise ValidationError"""
+    if '_error' in raw:
+        raise ValidationError(raw['_error'])
+    row = {}
+    for name, field in FIELDS.items():
+        value = raw.get(name)
+        try:
+            row[name] = field.clean('' if value is None else str(value).strip())
+        except ValidationError as exc:
+            raise ValidationError(f'{name}: {" ".join(exc.messages)}')
+    row['participants'] = _participants(raw.get('participants'))
+    if not row['participants']:
+        raise ValidationError('participants: This field is required.')
+    return row
+
+
+class ExpenseImporter:
+
+    def __init__(self, group, user, chunk_size=CHUNK_SIZE, dry_run=False, progress=None):
+        self.group = group
+        self.user = user
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.progress = progress
+        # The instance the previous chunk ended on, so it can continue across chunks
+        self.current_key = None
+        self.current_instance = None
+        self.report = {'rows': 0, 'instances': 0, 'items': 0, 'splits': 0, 'skipped': 0, 'errors': []}
+
+    def run(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        return self.report
+
+    def error(self, line_number, message):
+        self.report['skipped'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'line': line_number, 'error': message})
+
+    def validate(self, chunk):
+        """Clean a chunk's rows and resolve their users with a single query"""
+        cleaned = []
+        for line_number, raw in chunk:
+            try:
+                cleaned.append((line_number, _clean(raw)))
+            except ValidationError as exc:
+                self.error(line_number, ' '.join(exc.messages))
+
+        resolved = directory.resolve(
+            {identifier for _, row in cleaned for identifier in [row['payer'], *row['participants']]},
+            self.group.id,
+        )
+        valid = []
+        for line_number, row in cleaned:
+            unknown = [i for i in [row['payer'], *row['participants']] if i not in resolved]
+            if unknown:
+                self.error(line_number, f'Not members of this group: {", ".join(unknown)}')
+                continue
+            row['payer_id'] = resolved[row['payer']]
+            row['user_ids'] = list(dict.fromkeys(resolved[identifier] for identifier in row['participants']))
+            valid.append(row)
+        return valid
+
+    def import_chunk(self, chunk):
+        self.report['rows'] += len(chunk)
+        rows = self.validate(chunk)
+        if self.dry_run:
+            for row in rows:
+                key = (row['instance'], row['date'])
+                if key != self.current_key:
+                    self.current_key = key
+                    self.report['instances'] += 1
+            self.report['items'] += len(rows)
+        elif rows:
+            with transaction.atomic():
+                self.write(rows)
+        if self.progress:
+            self.progress(self.report)
+
+    def write(self, rows):
+        group_id = self.group.id
+        new_instances, placed = [], []
+        for row in rows:
+            key = (row['instance'], row['date'])
+            if key != self.current_key:
+                self.current_key = key
+                self.current_instance = Instance(
+                    group_id=group_id, name=row['instance'], date=row['date'],
+                    description=row['description'], created_by=self.user,
+                )
+                new_instances.append(self.current_instance)
+            placed.append((self.current_instance, row))
+        Instance.objects.bulk_create(new_instances)
+
+        items = Item.objects.bulk_create([
+            Item(instance=instance, name=row['item'], price=row['price'], created_by_id=row['payer_id'])
+            for instance, row in placed
+        ])
+
+        splits, deltas = [], {}
+        for item, (_, row) in zip(items, placed):
+            # Same rule as ItemViewSet.perform_create: a payer outside the split makes it a gift
+            if row['payer_id'] not in row['user_ids']:
+                continue
+            amount = split_amount(item.price, len(row['user_ids']))
+            splits.extend(ItemSplit(item=item, user_id=user_id, amount=amount) for user_id in row['user_ids'])
+            item_balance_deltas(row['payer_id'], ((user_id, amount) for user_id in row['user_ids']), deltas)
+        ItemSplit.objects.bulk_create(splits)
+
+        apply_balance_deltas(group_id, deltas)
+        summary.record_instances(group_id, len(new_instances), len(items), sum(item.price for item in items))
+        changes.record(group_id, ChangeLog.INSTANCE, [instance.id for instance in new_instances])
+        changes.record(group_id, ChangeLog.ITEM, [item.id for item in items])
+        changes.record(group_id, ChangeLog.SPLIT, [split.id for split in splits])
+
+        self.report['instances'] += len(new_instances)
+        self.report['items'] += len(items)
+        self.report['splits'] += len(splits)
+
+
+def import_stored_file(group_id, user_id, name, kind, dry_run=False):
+    """Job handler: import an upload kept in jobs.storage(), then remove it"""
+    storage = jobs.storage()
+    group = Group.objects.filter(id=group_id, is_deleting=False).first()
+    user = group.members.filter(id=user_id).first() if group is not None else None
+    if user is None:
+        # The group is gone or the uploader left it; retrying won't change that
+        storage.delete(name)
+        raise jobs.PermanentError(f'User {user_id} is no longer a member of group {group_id}')
+    with storage.open(name, 'rb') as handle:
+        report = ExpenseImporter(group, user, dry_run=dry_run).run(read_rows(handle, kind))
+    storage.delete(name)
+    return report
@@ -0,0 +1,238 @@
+"""
+Per-request instrumentation.
+
+RequestMetricsMiddleware opens a metrics record for each request. While it is
+open, database queries (via a wrapper installed on every connection) and the
+`timer()` blocks around authentication and serialization add to it. When the
+response is ready the record is folded into a process-wide registry, exposed
+in Prometheus text format at /api/metrics/ (to holders of METRICS_TOKEN), summarized in a Server-Timing
+header and, for a sample of requests, logged.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger('api.metrics')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'timings', '_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = {'serializer': 0.0, 'auth': 0.0}
+        self._depth = {}
+
+
+def current():
+    """The metrics record of the request being handled, if any"""
+    return _current.get()
+
+
+@contextmanager
+def timer(kind):
+    """
+    Add the time spent in the block to the current request's `kind` timing.
+
+    Nested blocks of the same kind (a serializer rendering its children) only
+    count once, at the outermost level.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics._depth.get(kind):
+        yield
+        return
+    metrics._depth[kind] = 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._depth[kind] = 0
+        metrics.timings[kind] = metrics.timings.get(kind, 0.0) + time.perf_counter() - start
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def _install_query_wrapper(sender, connection, **kwargs):
+    # Installed once per connection so queries from any thread are counted
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class MetricsRegistry:
+    """Process-wide aggregates keyed by (method, route)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, method, route, status, duration, metrics):
+        key = (method, route)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'requests': 0,
+                    'errors': 0,
+                    'duration': 0.0,
+                    'buckets': [0] * len(DURATION_BUCKETS),
+                    'queries': 0,
+                    'db': 0.0,
+                    'serializer': 0.0,
+                    'auth': 0.0,
+                }
+            series['requests'] += 1
+            if status >= 500:
+                series['errors'] += 1
+            series['duration'] += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    series['buckets'][i] += 1
+            series['queries'] += metrics.queries
+            series['db'] += metrics.db_time
+            series['serializer'] += metrics.timings.get('serializer', 0.0)
+            series['auth'] += metrics.timings.get('auth', 0.0)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def prometheus_text(self):
+        with self._lock:
+            series = {key: dict(value, buckets=list(value['buckets'])) for key, value in self._series.items()}
+
+        lines = []
+
+        def emit(name, kind, help_text, values):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(values)
+
+        def labels(method, route, **extra):
+            pairs = [('method', method), ('route', route)] + list(extra.items())
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+        emit('splitsmart_requests_total', 'counter', 'Requests handled.', [
+            f'splitsmart_requests_total{labels(*key)} {value["requests"]}' for key, value in series.items()
+        ])
+        emit('splitsmart_request_errors_total', 'counter', 'Requests answered with a 5xx status.', [
+            f'splitsmart_request_errors_total{labels(*key)} {value["errors"]}' for key, value in series.items()
+        ])
+
+        histogram = []
+        for key, value in series.items():
+            for bound, count in zip(DURATION_BUCKETS, value['buckets']):
+                histogram.append(f'splitsmart_request_duration_seconds_bucket{labels(*key, le=bound)} {count}')
+            histogram.append(f'splitsmart_request_duration_seconds_bucket{labels(*key, le="+Inf")} {value["requests"]}')
+            histogram.append(f'splitsmart_request_duration_seconds_sum{labels(*key)} {value["duration"]:.6f}')
+            histogram.append(f'splitsmart_request_duration_seconds_count{labels(*key)} {value["requests"]}')
+        emit('splitsmart_request_duration_seconds', 'histogram', 'Wall time per request.', histogram)
+
+        emit('splitsmart_db_queries_total', 'counter', 'Database queries issued.', [
+            f'splitsmart_db_queries_total{labels(*key)} {value["queries"]}' for key, value in series.items()
+        ])
+        for field, help_text in (
+            ('db', 'Time spent executing database queries.'),
+            ('serializer', 'Time spent serializing responses.'),
+            ('auth', 'Time spent authenticating requests.'),
+        ):
+            name = f'splitsmart_{field}_seconds_total'
+            emit(name, 'counter', help_text, [
+                f'{name}{labels(*key)} {value[field]:.6f}' for key, value in series.items()
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    # Async-capable so ASGI requests to async views never hop to a thread here
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    def finish(self, request, response, metrics, duration):
+        match = getattr(request, 'resolver_match', None)
+        # URL names ("balance-list", "group-simplify") keep the label set small
+        route = (match.view_name or match.route) if match else 'unmatched'
+        registry.observe(request.method, route, response.status_code, duration, metrics)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db_time * 1000:.1f}',
+            f'serializer;dur={metrics.timings.get("serializer", 0.0) * 1000:.1f}',
+            f'auth;dur={metrics.timings.get("auth", 0.0) * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ])
+
+        sample_rate = getattr(settings, 'REQUEST_LOG_SAMPLE_RATE', 0.0)
+        if sample_rate and random.random() < sample_rate:
+            logger.info(
+                '%s %s %s %.1fms queries=%d db=%.1fms serializer=%.1fms auth=%.1fms',
+                request.method, request.path, response.status_code, duration * 1000,
+                metrics.queries, metrics.db_time * 1000,
+                metrics.timings.get('serializer', 0.0) * 1000, metrics.timings.get('auth', 0.0) * 1000,
+            )
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the registry, only served when METRICS_TOKEN is set"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token or not getattr(settings, 'METRICS_ENABLED', False):
+        return HttpResponseNotFound()
+    if not constant_time_compare(request.headers.get('X-Metrics-Token', ''), token):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.prometheus_text(), content_type='text/plain; version=0.0.4')
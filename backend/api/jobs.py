@@ -0,0 +1,141 @@
+"""
+A small job queue kept in the database.
+
+Views enqueue work that doesn't have to finish inside the request: purging a
+deleted group, clearing a group's balances once its last item is gone,
+background imports. Each kind maps to a plain function that takes the job's
+payload as keyword arguments and returns something JSON-serializable.
+
+JOBS_EXECUTION decides who runs queued jobs:
+  'inline'  run immediately in the enqueuing process (the default, and the
+            only option on serverless deployments without a worker)
+  'thread'  run in a daemon thread once the enqueuing transaction commits
+  'worker'  leave them for `manage.py run_worker`
+
+Whatever runs a job claims it with a conditional UPDATE, so any number of
+workers can share the table. Failures are retried with exponential backoff
+up to max_attempts, except inline, where nothing would pick a retry up later,
+so the attempts are used up straight away; jobs left running by a dead worker are requeued after
+JOBS_LOCK_TIMEOUT seconds. A handler raises PermanentError when a retry
+can't help, and the job fails at once.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {
+    'purge_group': 'api.deletion.purge_group',
+    'clear_empty_group_balances': 'api.ledger.clear_balances_if_empty',
+    'import_expenses': 'api.importer.import_stored_file',
+}
+
+RETRY_BASE_DELAY = 5
+
+
+class PermanentError(Exception):
+    """Raised by a handler when its job can never succeed, so it isn't retried"""
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def storage():
+    """Where job inputs such as uploads wait for a worker, see JOBS_STORAGE_DIR"""
+    return FileSystemStorage(location=getattr(settings, 'JOBS_STORAGE_DIR', 'job_files'))
+
+
+def enqueue(kind, payload, user=None, max_attempts=3):
+    """Queue a job and start it according to JOBS_EXECUTION"""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind {kind!r}')
+    job = Job.objects.create(kind=kind, payload=payload, created_by=user, max_attempts=max_attempts)
+    mode = getattr(settings, 'JOBS_EXECUTION', 'inline')
+    if mode == 'inline':
+        while job is not None and job.status == Job.QUEUED:
+            job = run_claimed(claim(job_id=job.id), backoff=False)
+    elif mode == 'thread':
+        transaction.on_commit(
+            threading.Thread(target=_run_in_thread, args=(job.id,), daemon=True).start
+        )
+    return Job.objects.get(id=job.id)
+
+
+def _run_in_thread(job_id):
+    try:
+        run_claimed(claim(job_id=job_id))
+    finally:
+        close_old_connections()
+
+
+def claim(job_id=None, worker=None):
+    """
+    Mark a runnable job as running and return it, or None if there is none.
+
+    With `job_id`, claim that job only. The conditional UPDATE means two
+    workers racing for the same job can't both win.
+    """
+    now = timezone.now()
+    runnable = Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+    if job_id is not None:
+        runnable = runnable.filter(id=job_id)
+    for candidate in runnable.order_by('run_after', 'id').values_list('id', flat=True)[:10]:
+        claimed = Job.objects.filter(id=candidate, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker or worker_name(), locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=candidate)
+    return None
+
+
+def run_claimed(job, backoff=True):
+    """Run a job returned by claim() and record the outcome; without `backoff` a retry is runnable at once"""
+    if job is None:
+        return None
+    # Run inline inside a request's transaction, a failure must only undo the job's own work
+    scope = transaction.atomic() if transaction.get_connection().in_atomic_block else nullcontext()
+    try:
+        with scope:
+            result = import_string(HANDLERS[job.kind])(**job.payload)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed on attempt %s', job.id, job.kind, job.attempts)
+        job.error = ''.join(traceback.format_exception_only(type(exc), exc)).strip()
+        if job.attempts < job.max_attempts and not isinstance(exc, PermanentError):
+            job.status = Job.QUEUED
+            delay = RETRY_BASE_DELAY * 2 ** (job.attempts - 1) if backoff else 0
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'run_after', 'finished_at'])
+        return job
+
+    job.status = Job.SUCCEEDED
+    job.result = result
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale(timeout=None):
+    """Put jobs whose worker stopped mid-run back in the queue"""
+    timeout = timeout if timeout is not None else getattr(settings, 'JOBS_LOCK_TIMEOUT', 600)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status=Job.QUEUED, run_after=timezone.now())
@@ -0,0 +1,191 @@
+"""
+Incremental pairwise balance ledger.
+
+Each pair of users in a group has at most one Balance row, stored in canonical
+order with ``from_user_id < to_user_id``. The amount is signed: positive means
+``from_user`` owes ``to_user``, negative means the reverse. Writers never read
+a balance before changing it; they collapse their effect into per-pair deltas
+and apply each one with a single atomic ``UPDATE ... SET amount = amount + delta``.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Sum, When
+
+from . import changes, summary
+from .models import Balance, Group, GroupMember, ItemSplit
+
+CENT = Decimal('0.01')
+
+# Rows whose amount rounds to zero cents are settled and removed
+HALF_CENT = Decimal('0.005')
+
+
+def canonical_pair(user_a, user_b):
+    """Return the (lower_id, higher_id) key for a pair of user ids"""
+    return (user_a, user_b) if user_a < user_b else (user_b, user_a)
+
+
+def split_amount(price, user_count):
+    """Share of `price` owed by each of `user_count` users, rounded to cents"""
+    return (Decimal(price) / user_count).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def add_debt(deltas, debtor_id, creditor_id, amount):
+    """Record that `debtor_id` owes `creditor_id` a further `amount`"""
+    if debtor_id == creditor_id or not amount:
+        return deltas
+    pair = canonical_pair(debtor_id, creditor_id)
+    signed = amount if debtor_id == pair[0] else -amount
+    deltas[pair] = deltas.get(pair, Decimal('0')) + signed
+    return deltas
+
+
+def item_balance_deltas(payer_id, splits, deltas=None):
+    """
+    Collapse an item's splits into signed per-pair deltas.
+
+    `splits` is an iterable of (user_id, amount). Every participant other than
+    the payer owes the payer their share.
+    """
+    deltas = {} if deltas is None else deltas
+    for user_id, amount in splits:
+        add_debt(deltas, user_id, payer_id, amount)
+    return deltas
+
+
+def reverse_deltas(deltas):
+    """Deltas that undo `deltas`, used when an item is deleted"""
+    return {pair: -amount for pair, amount in deltas.items()}
+
+
+def apply_balance_deltas(group_id, deltas):
+    """
+    Apply signed per-pair deltas to a group's balances.
+
+    Each pair costs one UPDATE; a row is only inserted the first time a pair
+    appears. Pairs are visited in a fixed order so concurrent writers lock rows
+    in the same sequence.
+    """
+    touched = False
+    with transaction.atomic():
+        for (low, high), delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            touched = True
+            rows = Balance.objects.filter(group_id=group_id, from_user_id=low, to_user_id=high)
+            if rows.update(amount=F('amount') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    Balance.objects.create(
+                        group_id=group_id, from_user_id=low, to_user_id=high, amount=delta
+                    )
+            except IntegrityError:
+                # Another writer created the row first
+                rows.update(amount=F('amount') + delta)
+
+        if touched:
+            summary.apply_pair_deltas(group_id, deltas)
+            Balance.objects.filter(
+                group_id=group_id, amount__gt=-HALF_CENT, amount__lt=HALF_CENT
+            ).delete()
+            changes.record_balances(group_id)
+
+
+def clear_balances_if_empty(group_id):
+    """Drop all of a group's balances once it has no items left"""
+    if summary.has_items(group_id):
+        return {'deleted': 0}
+    deleted = Balance.objects.filter(group_id=group_id).delete()[0]
+    summary.reset_positions(group_id)
+    changes.record_balances(group_id)
+    return {'deleted': deleted}
+
+
+def expected_balances(group_id):
+    """
+    A group's balances derived from its splits, as {(low, high): signed amount}.
+
+    One grouped query sums what each participant owes each payer; only the
+    resulting (debtor, payer) totals are folded into canonical pairs here.
+    """
+    owed = (
+        ItemSplit.objects.filter(item__instance__group_id=group_id)
+        .exclude(user_id=F('item__created_by_id'))
+        .values_list('user_id', 'item__created_by_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    deltas = {}
+    for debtor_id, payer_id, total in owed:
+        add_debt(deltas, debtor_id, payer_id, total)
+    return {pair: amount for pair, amount in deltas.items() if abs(amount) >= HALF_CENT}
+
+
+def stored_balances(group_id):
+    return {
+        (low, high): amount
+        for low, high, amount in Balance.objects.filter(group_id=group_id).values_list(
+            'from_user_id', 'to_user_id', 'amount'
+        )
+    }
+
+
+def user_positions(user_id):
+    """
+    [(group_id, counterparty_id, net)] for every non-zero balance involving a user.
+
+    One grouped query over the user's groups; `net` is what the counterparty
+    owes the user, negative when the user owes them.
+    """
+    involves = Q(from_user_id=user_id) | Q(to_user_id=user_id)
+    return list(
+        Balance.objects.filter(involves, group_id__in=GroupMember.objects.filter(user_id=user_id).values('group_id'))
+        .annotate(
+            counterparty_id=Case(When(from_user_id=user_id, then=F('to_user_id')), default=F('from_user_id')),
+            signed=Case(When(from_user_id=user_id, then=-F('amount')), default=F('amount')),
+        )
+        .values_list('group_id', 'counterparty_id')
+        .annotate(net=Sum('signed'))
+        .exclude(net=0)
+        .order_by('group_id', 'counterparty_id')
+    )
+
+
+def balance_drift(expected, stored):
+    """[(pair, stored, expected)] for every pair where the two disagree"""
+    return [
+        (pair, stored.get(pair, Decimal('0')), expected.get(pair, Decimal('0')))
+        for pair in sorted(expected.keys() | stored.keys())
+        if stored.get(pair, Decimal('0')) != expected.get(pair, Decimal('0'))
+    ]
+
+
+def reconcile(group_id, repair=False):
+    """
+    Compare a group's stored balances with the ones its splits imply.
+
+    With `repair`, rewrite the drifted rows and rebuild the summary and
+    member positions in one transaction. The group row is locked first;
+    writers bump its version before committing, so they wait for the repair.
+    Returns (group_id, drift) with drift as from balance_drift().
+    """
+    if not repair:
+        return group_id, balance_drift(expected_balances(group_id), stored_balances(group_id))
+
+    with transaction.atomic():
+        Group.objects.select_for_update().filter(id=group_id).first()
+        expected = expected_balances(group_id)
+        drift = balance_drift(expected, stored_balances(group_id))
+        if drift:
+            for (low, high), _, amount in drift:
+                rows = Balance.objects.filter(group_id=group_id, from_user_id=low, to_user_id=high)
+                if (low, high) not in expected:
+                    rows.delete()
+                elif not rows.update(amount=amount):
+                    Balance.objects.create(group_id=group_id, from_user_id=low, to_user_id=high, amount=amount)
+            changes.record_balances(group_id)
+        # The summary and member positions follow the repaired balances
+        summary.rebuild(group_id)
+    return group_id, drift
@@ -0,0 +1,159 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import httpx
+from django.core.asgi import get_asgi_application
+from django.core.management.base import CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+from api.authentication import token_cache
+
+from .benchmark import Command as BenchmarkCommand, percentile
+
+MODES = ['wsgi', 'asgi']
+ENDPOINTS = ['balances/', 'groups/', 'instances/?page_size=20']
+
+# Seconds slow_verifier sleeps, standing in for a Firebase round trip
+verify_latency = 0.05
+
+
+def slow_verifier(id_token):
+    """Tokens look like '<username>.<nonce>'; every one costs verify_latency"""
+    time.sleep(verify_latency)
+    username = id_token.rsplit('.', 1)[0]
+    return {'uid': username, 'email': f'{username}@example.com', 'exp': time.time() + 3600}
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Compare concurrent dashboard reads on the sync WSGI stack (DRF views on a '
+        'fixed thread pool) with the async views under ASGI. Every request carries '
+        'a fresh token, so each one pays a simulated Firebase verification.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=MODES, help='Run only these modes')
+        parser.add_argument('--clients', type=int, default=50, help='Concurrent dashboard clients')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per mode')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads (gunicorn --threads)')
+        parser.add_argument('--verify-latency-ms', type=float, default=50.0)
+        parser.add_argument('--members', type=int, default=10)
+        parser.add_argument('--items', type=int, default=2000)
+        parser.add_argument('--items-per-instance', type=int, default=20)
+        parser.add_argument('--split-size', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+        parser.add_argument('--in-place', action='store_true', help='Use the configured database instead of a test database')
+
+    def run(self, options):
+        global verify_latency
+        if options['clients'] < 1 or options['threads'] < 1 or options['requests'] < 1:
+            raise CommandError('--clients, --threads and --requests must be positive')
+        verify_latency = options['verify_latency_ms'] / 1000
+
+        group, users = self.build_group(options['members'], options['items'], options['items_per_instance'], options['split_size'])
+        paths = [f'/api/{endpoint}' for endpoint in ENDPOINTS]
+        nonce = count()
+
+        def next_request():
+            i = next(nonce)
+            user = users[i % len(users)]
+            return i, {'Authorization': f'Bearer {user.username}.{i}'}
+
+        results = []
+        with override_settings(FIREBASE_TOKEN_VERIFIER='api.management.commands.bench_concurrency.slow_verifier'):
+            for mode in options['mode'] or MODES:
+                token_cache.clear()
+                run = self.run_wsgi if mode == 'wsgi' else self.run_asgi
+                started = time.perf_counter()
+                latencies = run(paths, next_request, options)
+                elapsed = time.perf_counter() - started
+                results.append({
+                    'scenario': mode,
+                    'iterations': len(latencies),
+                    'throughput_per_s': len(latencies) / elapsed,
+                    'p50_ms': percentile(latencies, 0.50) * 1000,
+                    'p99_ms': percentile(latencies, 0.99) * 1000,
+                    'mean_ms': statistics.mean(latencies) * 1000,
+                })
+        return results
+
+    def run_wsgi(self, paths, next_request, options):
+        """`clients` callers share `threads` workers; waiting for one counts towards latency"""
+        app = get_wsgi_application()
+        workers = threading.BoundedSemaphore(options['threads'])
+        remaining = iter(range(options['requests']))
+        lock = threading.Lock()
+        latencies = []
+
+        def client():
+            with httpx.Client(transport=httpx.WSGITransport(app=app), base_url='http://testserver') as http:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                        i, headers = next_request()
+                    start = time.perf_counter()
+                    with workers:
+                        response = http.get(paths[i % len(paths)], headers=headers)
+                    latency = time.perf_counter() - start
+                    self.check_response(response)
+                    with lock:
+                        latencies.append(latency)
+
+        with ThreadPoolExecutor(max_workers=options['clients']) as pool:
+            for future in [pool.submit(client) for _ in range(options['clients'])]:
+                future.result()
+        return latencies
+
+    def run_asgi(self, paths, next_request, options):
+        app = get_asgi_application()
+        async_paths = [path.replace('/api/', '/api/async/', 1) for path in paths]
+        remaining = iter(range(options['requests']))
+        latencies = []
+
+        async def client(http):
+            while next(remaining, None) is not None:
+                i, headers = next_request()
+                start = time.perf_counter()
+                response = await http.get(async_paths[i % len(async_paths)], headers=headers)
+                latencies.append(time.perf_counter() - start)
+                self.check_response(response)
+
+        async def main():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as http:
+                await asyncio.gather(*(client(http) for _ in range(options['clients'])))
+
+        asyncio.run(main())
+        return latencies
+
+    def check_response(self, response):
+        if response.status_code != 200:
+            raise CommandError(f'{response.request.url} failed with {response.status_code}: {response.content[:200]!r}')
+
+    def report(self, results, options):
+        header = f'{"mode":<8}{"requests":>10}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"mean ms":>10}'
+        self.stdout.write(
+            f'{options["clients"]} clients, {options["threads"]} WSGI threads, '
+            f'{options["verify_latency_ms"]:.0f}ms token verification'
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            self.stdout.write(
+                f'{row["scenario"]:<8}{row["iterations"]:>10}{row["throughput_per_s"]:>10.1f}'
+                f'{row["p50_ms"]:>10.2f}{row["p99_ms"]:>10.2f}{row["mean_ms"]:>10.2f}'
+            )
+        if options['json_path']:
+            import json
+
+            with open(options['json_path'], 'w') as handle:
+                json.dump({'options': {k: v for k, v in options.items() if k in (
+                    'clients', 'requests', 'threads', 'verify_latency_ms', 'members', 'items', 'seed'
+                )}, 'results': results}, handle, indent=2)
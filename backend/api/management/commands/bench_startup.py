@@ -0,0 +1,131 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Settings overrides per mode; 'eager-firebase' also initializes Firebase during import,
+# as every cold start did before api.authentication made it lazy
+MODES = {
+    'full': {'API_ONLY': 'false'},
+    'api-only': {'API_ONLY': 'true'},
+    'eager-firebase': {'API_ONLY': 'false', 'STARTUP_PROBE_EAGER_FIREBASE': '1'},
+}
+
+# Runs in a fresh interpreter: time the WSGI module import, then two balance reads
+PROBE = r'''
+import io, json, os, sys, time, types
+
+started = time.perf_counter()
+import splitsmart.wsgi
+if os.environ.get('STARTUP_PROBE_EAGER_FIREBASE'):
+    from api.authentication import firebase_app
+    firebase_app()
+imported = time.perf_counter()
+modules = len(sys.modules)
+
+from django.conf import settings
+
+# A local verifier so the timings don't include a Firebase round trip
+probe = types.ModuleType('startup_probe')
+probe.verify = lambda token: {'uid': 'probe', 'email': 'probe@example.com', 'exp': time.time() + 3600}
+sys.modules['startup_probe'] = probe
+settings.FIREBASE_TOKEN_VERIFIER = 'startup_probe.verify'
+
+
+def get(path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'HTTP_AUTHORIZATION': 'Bearer probe',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+    }
+    statuses = []
+    started = time.perf_counter()
+    b''.join(splitsmart.wsgi.application(environ, lambda status, headers: statuses.append(status)))
+    return (time.perf_counter() - started) * 1000, statuses[0]
+
+
+first_ms, first_status = get('/api/balances/')
+second_ms, _ = get('/api/balances/')
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': first_ms,
+    'second_request_ms': second_ms,
+    'status': first_status,
+    'modules': modules,
+    'modules_after_request': len(sys.modules),
+    'firebase_loaded': 'firebase_admin' in sys.modules,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure cold start: the time to import the WSGI application and to serve the first '
+        'and second balance reads, each run in a fresh interpreter against a scratch SQLite database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=list(MODES), help='Run only these modes')
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per mode')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be positive')
+        modes = options['mode'] or list(MODES)
+        if 'eager-firebase' in modes and not os.path.exists(settings.FIREBASE_CONFIG):
+            self.stderr.write('Skipping eager-firebase: no service account key at FIREBASE_CONFIG')
+            modes.remove('eager-firebase')
+
+        with tempfile.TemporaryDirectory() as sqlite_dir:
+            env = {
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': 'splitsmart.settings',
+                'DATABASE_PROFILE': 'sqlite',
+                'SQLITE_DIR': sqlite_dir,
+                'API_ONLY': 'false',
+            }
+            self.run_python(['manage.py', 'migrate', '--verbosity', '0'], env)
+            results = []
+            for mode in modes:
+                runs = [json.loads(self.run_python(['-c', PROBE], {**env, **MODES[mode]})) for _ in range(options['runs'])]
+                if any(run['status'] != '200 OK' for run in runs):
+                    raise CommandError(f'{mode}: the balance read answered {runs[0]["status"]}')
+                results.append({
+                    'scenario': mode,
+                    'runs': len(runs),
+                    **{
+                        key: statistics.median(run[key] for run in runs)
+                        for key in ('import_ms', 'first_request_ms', 'second_request_ms', 'modules', 'modules_after_request')
+                    },
+                    'firebase_loaded': runs[0]['firebase_loaded'],
+                })
+        self.report(results, options)
+
+    def run_python(self, args, env):
+        completed = subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'probe failed')
+        return completed.stdout.strip().splitlines()[-1] if completed.stdout.strip() else ''
+
+    def report(self, results, options):
+        header = f'{"mode":<16}{"import ms":>11}{"1st req ms":>12}{"2nd req ms":>12}{"modules":>9}{"firebase":>10}'
+        self.stdout.write(f'Medians of {options["runs"]} fresh interpreters per mode')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            self.stdout.write(
+                f'{row["scenario"]:<16}{row["import_ms"]:>11.1f}{row["first_request_ms"]:>12.1f}'
+                f'{row["second_request_ms"]:>12.2f}{row["modules_after_request"]:>9.0f}'
+                f'{"yes" if row["firebase_loaded"] else "no":>10}'
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as handle:
+                json.dump({'runs': options['runs'], 'results': results}, handle, indent=2)
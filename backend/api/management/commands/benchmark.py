@@ -0,0 +1,224 @@
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from api import summary
+from api.ledger import item_balance_deltas, split_amount
+from api.models import Balance, Group, GroupMember, GroupSummary, Instance, Item, ItemSplit
+
+SCENARIOS = ['item_create', 'item_delete', 'instance_list', 'balance_list', 'group_delete']
+
+BATCH_SIZE = 5000
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the split/balance write path and the list endpoints against a '
+        'synthetic group. Runs in a throwaway test database unless --in-place is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=10, help='Members in the synthetic group (10-500)')
+        parser.add_argument('--items', type=int, default=10000, help='Items in the synthetic group (10k-1M)')
+        parser.add_argument('--items-per-instance', type=int, default=20)
+        parser.add_argument('--split-size', type=int, default=3, help='Participants per generated item')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed operations per scenario')
+        parser.add_argument('--page-size', type=int, default=100, help='page_size used by list scenarios')
+        parser.add_argument('--delete-group-items', type=int, default=1000, help='Items in each group deleted by group_delete')
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Run only these scenarios')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+        parser.add_argument('--in-place', action='store_true', help='Use the configured database instead of a test database')
+
+    def handle(self, *args, **options):
+        if options['members'] < 2:
+            raise CommandError('--members must be at least 2')
+        options['split_size'] = max(1, min(options['split_size'], options['members']))
+        random.seed(options['seed'])
+
+        # Lets the test client through ALLOWED_HOSTS; already done under the test runner
+        try:
+            setup_test_environment()
+            own_environment = True
+        except RuntimeError:
+            own_environment = False
+
+        old_name = None
+        if not options['in_place']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            results = self.run(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            if own_environment:
+                teardown_test_environment()
+
+        self.report(results, options)
+
+    def run(self, options):
+        started = time.perf_counter()
+        group, users = self.build_group(options['members'], options['items'], options['items_per_instance'], options['split_size'])
+        self.stdout.write(
+            f'Generated {options["members"]} members and {options["items"]} items '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+
+        client = APIClient()
+        client.force_authenticate(users[0])
+        context = {'group': group, 'users': users, 'client': client, 'options': options}
+
+        results = []
+        for name in options['scenario'] or SCENARIOS:
+            results.append(getattr(self, f'bench_{name}')(context))
+        return results
+
+    def build_group(self, member_count, item_count, items_per_instance, split_size, label='bench'):
+        """Bulk-generate a group with consistent splits, balances and summary"""
+        suffix = f'{label}-{Group.objects.count()}'
+        users = User.objects.bulk_create([
+            User(username=f'{suffix}-{i}', email=f'{suffix}-{i}@example.com') for i in range(member_count)
+        ])
+        group = Group.objects.create(name=suffix, created_by=users[0])
+        GroupMember.objects.bulk_create([GroupMember(group=group, user=user) for user in users])
+
+        instance_count = max(1, -(-item_count // items_per_instance))
+        start = date(2020, 1, 1)
+        instances = Instance.objects.bulk_create([
+            Instance(group=group, name=f'Expense {i}', date=start + timedelta(days=i % 1500), created_by=users[i % member_count])
+            for i in range(instance_count)
+        ], batch_size=BATCH_SIZE)
+
+        deltas = {}
+        user_ids = [user.id for user in users]
+        for offset in range(0, item_count, BATCH_SIZE):
+            specs = []
+            for i in range(offset, min(offset + BATCH_SIZE, item_count)):
+                payer_id = random.choice(user_ids)
+                others = random.sample([u for u in user_ids if u != payer_id], split_size - 1)
+                specs.append((
+                    Item(
+                        instance=instances[i // items_per_instance],
+                        name=f'Item {i}',
+                        price=Decimal(random.randint(100, 20000)) / 100,
+                        created_by_id=payer_id,
+                    ),
+                    [payer_id] + others,
+                ))
+            items = Item.objects.bulk_create([item for item, _ in specs])
+            splits = []
+            for item, participants in specs:
+                amount = split_amount(item.price, len(participants))
+                splits.extend(ItemSplit(item=item, user_id=user_id, amount=amount) for user_id in participants)
+                item_balance_deltas(item.created_by_id, ((user_id, amount) for user_id in participants), deltas)
+            ItemSplit.objects.bulk_create(splits, batch_size=BATCH_SIZE)
+
+        Balance.objects.bulk_create([
+            Balance(group=group, from_user_id=low, to_user_id=high, amount=amount)
+            for (low, high), amount in deltas.items() if amount
+        ], batch_size=BATCH_SIZE)
+        GroupSummary.objects.get_or_create(group=group)
+        summary.rebuild(group.id)
+        return group, users
+
+    def measure(self, name, iterations, operation):
+        """Run `operation(i)` `iterations` times, timing each call and counting its queries"""
+        durations, queries = [], []
+        for i in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = operation(i)
+                durations.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise CommandError(f'{name} failed with {response.status_code}: {response.content[:200]!r}')
+            queries.append(len(captured))
+        total = sum(durations)
+        return {
+            'scenario': name,
+            'iterations': iterations,
+            'throughput_per_s': iterations / total if total else 0.0,
+            'p50_ms': percentile(durations, 0.50) * 1000,
+            'p99_ms': percentile(durations, 0.99) * 1000,
+            'mean_queries': statistics.mean(queries),
+            'max_queries': max(queries),
+        }
+
+    def bench_item_create(self, context):
+        users, options = context['users'], context['options']
+        instance_id = Instance.objects.filter(group=context['group']).values_list('id', flat=True).first()
+        participants = [str(user.id) for user in users[:options['split_size']]]
+        return self.measure('item_create', options['iterations'], lambda i: context['client'].post(
+            '/api/items/',
+            {'instance': instance_id, 'name': f'Bench {i}', 'price': '12.34', 'shared_with': participants},
+            format='json',
+        ))
+
+    def bench_item_delete(self, context):
+        options = context['options']
+        item_ids = list(
+            Item.objects.filter(instance__group=context['group'], created_by=context['users'][0])
+            .order_by('-id').values_list('id', flat=True)[:options['iterations']]
+        )
+        if not item_ids:
+            raise CommandError('No items to delete; increase --items')
+        return self.measure('item_delete', len(item_ids), lambda i: context['client'].delete(f'/api/items/{item_ids[i]}/'))
+
+    def bench_instance_list(self, context):
+        options = context['options']
+        url = f'/api/instances/?group={context["group"].id}&page_size={options["page_size"]}'
+        return self.measure('instance_list', options['iterations'], lambda i: context['client'].get(url))
+
+    def bench_balance_list(self, context):
+        return self.measure('balance_list', context['options']['iterations'], lambda i: context['client'].get('/api/balances/'))
+
+    def bench_group_delete(self, context):
+        options = context['options']
+        iterations = max(1, min(options['iterations'], 5))
+        groups = []
+        for _ in range(iterations):
+            group, users = self.build_group(
+                options['members'], options['delete_group_items'], options['items_per_instance'], options['split_size'], 'delete'
+            )
+            groups.append((group.id, users[0]))
+
+        client = context['client']
+
+        def delete(i):
+            group_id, owner = groups[i]
+            client.force_authenticate(owner)
+            return client.delete(f'/api/groups/{group_id}/')
+
+        result = self.measure('group_delete', iterations, delete)
+        client.force_authenticate(context['users'][0])
+        return result
+
+    def report(self, results, options):
+        header = f'{"scenario":<15}{"iters":>7}{"ops/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"queries":>9}{"max q":>7}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            self.stdout.write(
+                f'{row["scenario"]:<15}{row["iterations"]:>7}{row["throughput_per_s"]:>10.1f}'
+                f'{row["p50_ms"]:>10.2f}{row["p99_ms"]:>10.2f}{row["mean_queries"]:>9.1f}{row["max_queries"]:>7}'
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as handle:
+                json.dump({'options': {k: v for k, v in options.items() if k in (
+                    'members', 'items', 'items_per_instance', 'split_size', 'iterations', 'page_size', 'seed'
+                )}, 'results': results}, handle, indent=2)
@@ -0,0 +1,59 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.directory import directory
+from api.importer import CHUNK_SIZE, COLUMNS, ExpenseImporter, read_rows
+from api.models import Group
+
+
+class Command(BaseCommand):
+    help = (
+        'Import expenses into a group from CSV or NDJSON with columns '
+        + ', '.join(COLUMNS) + '. Participants are ;-separated in CSV. '
+        'Rows are committed in chunks; invalid rows are skipped and reported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('group', type=int)
+        parser.add_argument('path', help="File to import, or - for stdin")
+        parser.add_argument('--type', choices=['csv', 'ndjson'], help='Defaults to the file extension, else csv')
+        parser.add_argument('--user', help='Id, username or email recorded as the instances\' creator (default: group creator)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate without writing')
+
+    def handle(self, *args, **options):
+        group = Group.objects.filter(id=options['group'], is_deleting=False).select_related('created_by').first()
+        if group is None:
+            raise CommandError(f'Group {options["group"]} does not exist')
+        user = group.created_by
+        if options['user']:
+            user_id = directory.resolve([options['user']], group.id).get(options['user'])
+            if user_id is None:
+                raise CommandError(f'{options["user"]} is not a member of group {group.id}')
+            user = group.members.get(id=user_id)
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        path = options['path']
+        kind = options['type'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        started = time.perf_counter()
+
+        def progress(report):
+            self.stdout.write(
+                f'{report["rows"]} rows, {report["items"]} items, {report["skipped"]} skipped '
+                f'({report["rows"] / (time.perf_counter() - started):.0f} rows/s)'
+            )
+
+        importer = ExpenseImporter(group, user, options['chunk_size'], options['dry_run'], progress)
+        if path == '-':
+            report = importer.run(read_rows(sys.stdin.buffer, kind))
+        else:
+            with open(path, 'rb') as handle:
+                report = importer.run(read_rows(handle, kind))
+
+        for error in report['errors']:
+            self.stderr.write(f'line {error["line"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(json.dumps({k: v for k, v in report.items() if k != 'errors'})))
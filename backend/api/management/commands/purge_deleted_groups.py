@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.deletion import CHUNK_SIZE, purge_group, purge_instance
+from api.models import Group, Instance
+
+
+class Command(BaseCommand):
+    help = (
+        'Finish deleting groups and instances left marked as deleting, '
+        'e.g. after a worker or request was stopped mid-purge'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        instance_ids = list(
+            Instance.objects.filter(is_deleting=True, group__is_deleting=False).values_list('id', flat=True)
+        )
+        for instance_id in instance_ids:
+            counts = purge_instance(instance_id, options['chunk_size'])
+            self.stdout.write(f'Instance {instance_id}: ' + ', '.join(f'{count} {name}' for name, count in counts.items()))
+
+        group_ids = list(Group.objects.filter(is_deleting=True).values_list('id', flat=True))
+        for group_id in group_ids:
+            counts = purge_group(group_id, options['chunk_size'])
+            self.stdout.write(f'Group {group_id}: ' + ', '.join(f'{count} {name}' for name, count in counts.items()))
+        self.stdout.write(self.style.SUCCESS(f'Purged {len(instance_ids)} instance(s), {len(group_ids)} group(s)'))
@@ -0,0 +1,57 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.ledger import reconcile
+from api.models import Group
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every group\'s balances from its items and splits and report '
+        'groups whose stored balances have drifted. With --repair, rewrite them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, action='append', dest='groups', help='Only check these groups')
+        parser.add_argument('--repair', action='store_true', help='Rewrite drifted balances, summaries and positions')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (1 runs in-process)')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Groups handed to a worker at a time')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        group_ids = options['groups'] or list(Group.objects.order_by('id').values_list('id', flat=True))
+        started = time.perf_counter()
+        drifted = rows = 0
+        for group_id, drift in self.reconcile_all(group_ids, options):
+            if not drift:
+                continue
+            drifted += 1
+            rows += len(drift)
+            self.stdout.write(f'Group {group_id}: {len(drift)} pair(s) drifted')
+            if options['verbosity'] > 1:
+                for (low, high), stored, expected in drift:
+                    self.stdout.write(f'  users {low}/{high}: stored {stored}, expected {expected}')
+
+        action = 'repaired' if options['repair'] else 'found'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(group_ids)} group(s) in {time.perf_counter() - started:.1f}s; '
+            f'{action} drift in {drifted} group(s), {rows} pair(s)'
+        ))
+
+    def reconcile_all(self, group_ids, options):
+        repairs = [options['repair']] * len(group_ids)
+        if options['workers'] == 1 or len(group_ids) <= 1:
+            yield from map(reconcile, group_ids, repairs)
+            return
+
+        # Children must open their own connections rather than share ours
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            yield from pool.map(reconcile, group_ids, repairs, chunksize=options['chunk_size'])
@@ -0,0 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (see api.jobs). Use with JOBS_EXECUTION=worker; '
+        'any number of workers can run against the same database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='Jobs run at the same time')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is runnable')
+        parser.add_argument('--worker-id', help='Recorded on claimed jobs (default: host:pid:thread)')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1:
+            raise CommandError('--threads must be positive')
+        self.stop = threading.Event()
+        self.counts = {'succeeded': 0, 'failed': 0, 'retried': 0}
+        self.lock = threading.Lock()
+
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale job(s)')
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            futures = [pool.submit(self.loop, n, options) for n in range(options['threads'])]
+            try:
+                for future in futures:
+                    future.result()
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping after the running jobs finish')
+                self.stop.set()
+
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{count} {name}' for name, count in self.counts.items())))
+
+    def loop(self, n, options):
+        worker = f'{options["worker_id"]}:{n}' if options['worker_id'] else None
+        lock_timeout = getattr(settings, 'JOBS_LOCK_TIMEOUT', 600)
+        last_requeue = time.monotonic()
+        try:
+            while not self.stop.is_set():
+                if n == 0 and time.monotonic() - last_requeue > lock_timeout:
+                    jobs.requeue_stale()
+                    last_requeue = time.monotonic()
+                job = jobs.run_claimed(jobs.claim(worker=worker))
+                if job is None:
+                    if options['once']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+                    continue
+                self.record(job)
+        finally:
+            close_old_connections()
+
+    def record(self, job):
+        if job.status == job.SUCCEEDED:
+            outcome = 'succeeded'
+        elif job.status == job.FAILED:
+            outcome = 'failed'
+        else:
+            outcome = 'retried'
+        with self.lock:
+            self.counts[outcome] += 1
+        self.stdout.write(f'Job {job.id} ({job.kind}) {outcome} after {job.attempts} attempt(s)')
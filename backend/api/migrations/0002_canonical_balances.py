@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def canonicalize_balances(apps, schema_editor):
+    """Merge directional Balance rows into one signed row per user pair"""
+    Balance = apps.get_model('api', 'Balance')
+    totals = {}
+    for balance in Balance.objects.all().iterator():
+        if balance.from_user_id < balance.to_user_id:
+            key, amount = (balance.group_id, balance.from_user_id, balance.to_user_id), balance.amount
+        else:
+            key, amount = (balance.group_id, balance.to_user_id, balance.from_user_id), -balance.amount
+        totals[key] = totals.get(key, 0) + amount
+
+    Balance.objects.all().delete()
+    Balance.objects.bulk_create([
+        Balance(group_id=group_id, from_user_id=low, to_user_id=high, amount=amount)
+        for (group_id, low, high), amount in totals.items()
+        if amount
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_balances, migrations.RunPython.noop),
+    ]
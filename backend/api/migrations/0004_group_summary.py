@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def backfill_summaries(apps, schema_editor):
+    Group = apps.get_model('api', 'Group')
+    GroupMember = apps.get_model('api', 'GroupMember')
+    GroupSummary = apps.get_model('api', 'GroupSummary')
+    Instance = apps.get_model('api', 'Instance')
+    Item = apps.get_model('api', 'Item')
+    Balance = apps.get_model('api', 'Balance')
+
+    items = {
+        row['instance__group_id']: row
+        for row in Item.objects.values('instance__group_id').annotate(
+            count=Count('id'), spend=Sum('price'), last=Max('created_at')
+        )
+    }
+    instances = dict(
+        Instance.objects.values('group_id').annotate(count=Count('id')).values_list('group_id', 'count')
+    )
+    GroupSummary.objects.bulk_create([
+        GroupSummary(
+            group_id=group_id,
+            item_count=items.get(group_id, {}).get('count', 0),
+            total_spend=items.get(group_id, {}).get('spend') or 0,
+            instance_count=instances.get(group_id, 0),
+            last_activity_at=items.get(group_id, {}).get('last'),
+        )
+        for group_id in Group.objects.values_list('id', flat=True)
+    ], batch_size=500)
+
+    positions = {}
+    for group_id, from_user_id, to_user_id, amount in Balance.objects.values_list(
+        'group_id', 'from_user_id', 'to_user_id', 'amount'
+    ):
+        positions[(group_id, from_user_id)] = positions.get((group_id, from_user_id), 0) - amount
+        positions[(group_id, to_user_id)] = positions.get((group_id, to_user_id), 0) + amount
+    members = []
+    for member in GroupMember.objects.all():
+        member.net_position = positions.get((member.group_id, member.user_id), 0)
+        members.append(member)
+    GroupMember.objects.bulk_update(members, ['net_position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupSummary',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='api.group')),
+                ('total_spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('item_count', models.IntegerField(default=0)),
+                ('instance_count', models.IntegerField(default=0)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='groupmember',
+            name='net_position',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
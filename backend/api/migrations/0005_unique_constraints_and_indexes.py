@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicates(apps, model_name, key_fields, sum_field):
+    """Fold rows sharing `key_fields` into the oldest one, adding up `sum_field`"""
+    Model = apps.get_model('api', model_name)
+    duplicated = Model.objects.values(*key_fields).annotate(rows=Count('id')).filter(rows__gt=1)
+    for key in duplicated:
+        key.pop('rows')
+        rows = list(Model.objects.filter(**key).order_by('id'))
+        keep = rows[0]
+        setattr(keep, sum_field, sum(getattr(row, sum_field) for row in rows))
+        keep.save(update_fields=[sum_field])
+        Model.objects.filter(pk__in=[row.pk for row in rows[1:]]).delete()
+
+
+def merge_memberships(apps):
+    """Keep the oldest of duplicated memberships, an admin if any of them was"""
+    GroupMember = apps.get_model('api', 'GroupMember')
+    duplicated = GroupMember.objects.values('group', 'user').annotate(rows=Count('id')).filter(rows__gt=1)
+    for key in duplicated:
+        key.pop('rows')
+        rows = list(GroupMember.objects.filter(**key).order_by('id'))
+        keep = rows[0]
+        # 0004 wrote the full position onto every duplicate, so it is kept, not added up
+        keep.is_admin = any(row.is_admin for row in rows)
+        keep.save(update_fields=['is_admin'])
+        GroupMember.objects.filter(pk__in=[row.pk for row in rows[1:]]).delete()
+
+
+def remove_duplicates(apps, schema_editor):
+    merge_duplicates(apps, 'Balance', ['group', 'from_user', 'to_user'], 'amount')
+    merge_memberships(apps)
+    merge_duplicates(apps, 'ItemSplit', ['item', 'user'], 'amount')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_group_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='balance',
+            index=models.Index(fields=['from_user', 'group'], name='balance_from_user_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balance',
+            index=models.Index(fields=['to_user', 'group'], name='balance_to_user_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupmember',
+            index=models.Index(fields=['user', 'group'], name='groupmember_user_group_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='balance',
+            constraint=models.UniqueConstraint(fields=('group', 'from_user', 'to_user'), name='unique_balance_pair'),
+        ),
+        migrations.AddConstraint(
+            model_name='balance',
+            constraint=models.CheckConstraint(condition=models.Q(('from_user__lt', models.F('to_user'))), name='balance_canonical_order'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupmember',
+            constraint=models.UniqueConstraint(fields=('group', 'user'), name='unique_group_member'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemsplit',
+            constraint=models.UniqueConstraint(fields=('item', 'user'), name='unique_item_split'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instance',
+            name='is_deleting',
+            field=models.BooleanField(default=False),
+        ),
+    ]
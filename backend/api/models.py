@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 # Create your models here.
@@ -8,12 +9,35 @@ class Group(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_groups')
     created_at = models.DateTimeField(auto_now_add=True)
     members = models.ManyToManyField(User, through='GroupMember', related_name='user_groups')  # Changed from 'groups' to 'user_groups'
+    # Bumped by every write to the group or anything in it (see api.changes); feeds ETags
+    version = models.PositiveBigIntegerField(default=1)
+    # Set while api.deletion purges the group's rows in chunks
+    is_deleting = models.BooleanField(default=False)
 
 class GroupMember(models.Model):
     group = models.ForeignKey(Group, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     joined_at = models.DateTimeField(auto_now_add=True)
     is_admin = models.BooleanField(default=False)
+    # What the rest of the group owes this member (negative when they owe), kept in step with Balance
+    net_position = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'user'], name='unique_group_member'),
+        ]
+        indexes = [
+            # "Groups I belong to", the join behind every list endpoint
+            models.Index(fields=['user', 'group'], name='groupmember_user_group_idx'),
+        ]
+
+class GroupSummary(models.Model):
+    # Denormalized totals, updated by every item and instance write
+    group = models.OneToOneField(Group, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    total_spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    item_count = models.IntegerField(default=0)
+    instance_count = models.IntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
 
 class Instance(models.Model):
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='instances')
@@ -22,6 +46,15 @@ class Instance(models.Model):
     description = models.TextField(blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set while api.deletion removes the instance's items in chunks
+    is_deleting = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination on (-date, -id) and ?group= / date range filters
+            models.Index(fields=['group', 'date', 'id'], name='instance_group_date_idx'),
+            models.Index(fields=['created_by', 'date', 'id'], name='instance_creator_date_idx'),
+        ]
 
 class Item(models.Model):
     instance = models.ForeignKey(Instance, on_delete=models.CASCADE, related_name='items')
@@ -31,14 +64,90 @@ class Item(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     shared_with = models.ManyToManyField(User, through='ItemSplit', related_name='shared_items')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['instance', 'id'], name='item_instance_id_idx'),
+            models.Index(fields=['created_by', 'id'], name='item_creator_id_idx'),
+        ]
+
 class ItemSplit(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='splits')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'user'], name='unique_item_split'),
+        ]
+
 class Balance(models.Model):
+    # One row per pair of users with from_user_id < to_user_id. A positive
+    # amount means from_user owes to_user, a negative one the reverse.
     group = models.ForeignKey(Group, on_delete=models.CASCADE)
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='debts')
     to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='credits')
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
\ No newline at end of file
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'from_user', 'to_user'], name='unique_balance_pair'),
+            models.CheckConstraint(condition=models.Q(from_user__lt=models.F('to_user')), name='balance_canonical_order'),
+        ]
+        indexes = [
+            # Balances involving a user on either side, optionally within one group
+            models.Index(fields=['from_user', 'group'], name='balance_from_user_group_idx'),
+            models.Index(fields=['to_user', 'group'], name='balance_to_user_group_idx'),
+        ]
+
+class ChangeLog(models.Model):
+    # Append-only feed behind /api/sync/; the id doubles as the client's cursor.
+    # group_id is a plain column so tombstones outlive the group they describe.
+    GROUP = 'group'
+    INSTANCE = 'instance'
+    ITEM = 'item'
+    SPLIT = 'split'
+    BALANCE = 'balance'
+
+    group_id = models.BigIntegerField()
+    # Set when only this user should see the entry, e.g. a group they lost access to
+    user_id = models.BigIntegerField(null=True, blank=True)
+    model = models.CharField(max_length=16)
+    # Null for BALANCE entries, which mean "this group's balances changed"
+    object_id = models.BigIntegerField(null=True, blank=True)
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group_id', 'id'], name='changelog_group_cursor_idx'),
+            models.Index(fields=['user_id', 'id'], name='changelog_user_cursor_idx'),
+        ]
+
+class Job(models.Model):
+    # Background work queued by api.jobs and run by `manage.py run_worker`
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest runnable job
+            models.Index(fields=['status', 'run_after', 'id'], name='job_claim_idx'),
+        ]
@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that clients opt into with ?page_size=.
+
+    Without it list endpoints keep returning a plain array, so existing callers
+    are unaffected. Views set `ordering` to match one of their composite indexes.
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+
+class InstancePagination(KeysetPagination):
+    ordering = ('-date', '-id')
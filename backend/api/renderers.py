@@ -0,0 +1,66 @@
+"""
+Compact JSON, selected with ?format=compact or Accept: application/vnd.splitsmart.compact+json.
+
+Nested users become their ids, and every user appears once in a `users`
+map next to the data:
+
+    {"data": <the usual body with user ids>, "users": {"<id>": {...}}}
+
+Serializers build each user's fields once per response (see UserField) and
+hand back a UserRef, an int that remembers them; the renderer collects the
+refs into `users` as it encodes. orjson is used when it is installed.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COMPACT = 'compact'
+
+
+class UserRef(int):
+    """A user's id carrying the user's serialized fields"""
+
+    def __new__(cls, user_id, data):
+        ref = super().__new__(cls, user_id)
+        ref.data = data
+        return ref
+
+    def __reduce__(self):
+        # Keeps the fields when cached responses are pickled
+        return UserRef, (int(self), self.data)
+
+
+def is_compact(context):
+    request = context.get('request') if context else None
+    renderer = getattr(request, 'accepted_renderer', None)
+    return getattr(renderer, 'format', None) == COMPACT
+
+
+def extract_users(data, users):
+    """`data` with UserRefs replaced by plain ids, collecting their fields into `users`"""
+    if isinstance(data, UserRef):
+        users[str(int(data))] = data.data
+        return int(data)
+    if isinstance(data, dict):
+        return {key: extract_users(value, users) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [extract_users(value, users) for value in data]
+    return data
+
+
+class CompactJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.splitsmart.compact+json'
+    format = COMPACT
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        users = {}
+        body = {'data': extract_users(data, users), 'users': users}
+        if orjson is None:
+            return super().render(body, accepted_media_type, renderer_context)
+        return orjson.dumps(body, default=JSONEncoder().default)
@@ -0,0 +1,112 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary ('default'). Reads go to the 'replica' alias
+only inside replica_reads(), which the read endpoints enter for safe
+requests, and only when DATABASES defines a replica; everything else,
+including management commands and jobs, reads from the primary.
+
+Two rules keep users reading their own writes despite replication lag: once
+a request writes, the rest of its reads come from the primary, and a user
+whose request wrote is pinned to the primary for REPLICA_PIN_SECONDS. Pins
+live in the 'responses' cache, which every worker shares when RESPONSE_CACHE
+is 'file' or redis; settings refuse a replica on Postgres otherwise.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+# {'wrote': bool} while a request may read from the replica
+_routing = ContextVar('db_routing', default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def reading_from_replica():
+    state = _routing.get()
+    return state is not None and not state['wrote'] and replica_configured()
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Send the reads made inside the block to the replica, until the first write"""
+    token = _routing.set({'wrote': False} if enabled else None)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+def _pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def _pins():
+    # Shared by the workers, unlike the per-process default cache
+    return caches['responses']
+
+
+def pin_to_primary(user_id):
+    """Read this user's requests from the primary until the replica has caught up"""
+    _pins().set(_pin_key(user_id), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def pinned_to_primary(user_id):
+    return _pins().get(_pin_key(user_id)) is not None
+
+
+async def apinned_to_primary(user_id):
+    return await _pins().aget(_pin_key(user_id)) is not None
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return REPLICA if reading_from_replica() else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state['wrote'] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests for `replica_actions` from the replica.
+
+    Unsafe requests that succeed pin their user to the primary.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+            and replica_configured()
+            and not pinned_to_primary(request.user.pk)
+        ):
+            self._replica_reads = replica_reads()
+            self._replica_reads.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        replica = getattr(self, '_replica_reads', None)
+        if replica is not None:
+            self._replica_reads = None
+            replica.__exit__(None, None, None)
+        elif request.method not in SAFE_METHODS and response.status_code < 400 and request.user.is_authenticated:
+            pin_to_primary(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
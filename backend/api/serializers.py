@@ -1,59 +1,170 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Group, GroupMember, Instance, Item, ItemSplit, Balance
+from .instrumentation import timer
+from .models import Group, GroupMember, GroupSummary, Instance, Item, ItemSplit, Balance, Job
+from .renderers import UserRef, is_compact
 
-class UserSerializer(serializers.ModelSerializer):
+class ModelSerializer(serializers.ModelSerializer):
+    """Counts rendering time towards the request's serializer timing"""
+
+    def to_representation(self, instance):
+        with timer('serializer'):
+            return super().to_representation(instance)
+
+class MemberRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    A group, or a row in one, that the requesting user is a member of.
+
+    `member_lookup` is the path from the field's model to the group's members;
+    rows of groups or instances being deleted take no new writes.
+    """
+
+    def __init__(self, member_lookup, **kwargs):
+        self.member_lookup = member_lookup
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        if request is None:
+            return self.queryset.none()
+        return self.queryset.filter(**{self.member_lookup: request.user})
+
+class UserSerializer(ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
-class GroupMemberSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class UserField(UserSerializer):
+    """
+    A nested user, or in the compact format (api.renderers) a UserRef to it.
+
+    Compact responses serialize each user once and share the result between
+    every row that mentions them.
+    """
+
+    def to_representation(self, instance):
+        if not is_compact(self.context):
+            return super().to_representation(instance)
+        seen = self.context.setdefault('compact_users', {})
+        if instance.pk not in seen:
+            seen[instance.pk] = UserRef(instance.pk, super().to_representation(instance))
+        return seen[instance.pk]
+
+class GroupMemberSerializer(ModelSerializer):
+    user = UserField(read_only=True)
     
     class Meta:
         model = GroupMember
         fields = ['id', 'user', 'joined_at']
 
-class GroupSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
-    members = UserSerializer(many=True, read_only=True)
+class GroupSummarySerializer(ModelSerializer):
+    class Meta:
+        model = GroupSummary
+        fields = ['total_spend', 'item_count', 'instance_count', 'last_activity_at']
+
+class MemberPositionSerializer(ModelSerializer):
+    class Meta:
+        model = GroupMember
+        fields = ['user', 'net_position']
+
+class GroupSerializer(ModelSerializer):
+    created_by = UserField(read_only=True)
+    members = UserField(many=True, read_only=True)
+    summary = GroupSummarySerializer(read_only=True, allow_null=True)
+    member_positions = MemberPositionSerializer(source='groupmember_set', many=True, read_only=True)
     
     class Meta:
         model = Group
-        fields = ['id', 'name', 'description', 'created_by', 'created_at', 'members']
+        fields = ['id', 'name', 'description', 'created_by', 'created_at', 'members', 'summary', 'member_positions']
 
-class ItemSplitSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class ItemSplitSerializer(ModelSerializer):
+    user = UserField(read_only=True)
     
     class Meta:
         model = ItemSplit
         fields = ['id', 'user', 'amount']
 
-class ItemSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
+class ItemSerializer(ModelSerializer):
+    created_by = UserField(read_only=True)
     shared_with = ItemSplitSerializer(source='splits', many=True, read_only=True)
-    # Add this line to make instance writable:
-    instance = serializers.PrimaryKeyRelatedField(queryset=Instance.objects.all())
+    # Writable, but only to instances in the caller's groups
+    instance = MemberRelatedField(
+        'group__members', queryset=Instance.objects.filter(is_deleting=False, group__is_deleting=False)
+    )
     
     class Meta:
         model = Item
         fields = ['id', 'name', 'price', 'created_by', 'created_at', 'shared_with', 'instance']
 
-class InstanceSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
-    # Add the group field for writes
-    group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all())
+    def validate_instance(self, instance):
+        # Its splits, balances and group summary stay with the instance it was created in
+        if self.instance is not None and instance.id != self.instance.instance_id:
+            raise serializers.ValidationError('Items cannot be moved to another instance.')
+        return instance
+
+class BulkItemEntrySerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    shared_with = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+
+class BulkItemSerializer(serializers.Serializer):
+    instance = MemberRelatedField(
+        'group__members', queryset=Instance.objects.filter(is_deleting=False, group__is_deleting=False)
+    )
+    items = BulkItemEntrySerializer(many=True, allow_empty=False, max_length=1000)
+
+class InstanceSerializer(ModelSerializer):
+    created_by = UserField(read_only=True)
+    # Add the group field for writes; only the caller's groups, and none being deleted
+    group = MemberRelatedField('members', queryset=Group.objects.filter(is_deleting=False))
     items = ItemSerializer(many=True, read_only=True)
     
     class Meta:
         model = Instance
         fields = ['id', 'name', 'date', 'description', 'group', 'created_by', 'created_at', 'items']
 
+    def validate_group(self, group):
+        # Its items, balances and group summary stay with the group it was created in
+        if self.instance is not None and group.id != self.instance.group_id:
+            raise serializers.ValidationError('Instances cannot be moved to another group.')
+        return group
+
+
+class InstanceRecordSerializer(ModelSerializer):
+    """Flat instance row for the sync feed; items arrive as their own records"""
+    class Meta:
+        model = Instance
+        fields = ['id', 'name', 'date', 'description', 'group', 'created_by', 'created_at']
 
-class BalanceSerializer(serializers.ModelSerializer):
-    from_user = UserSerializer(read_only=True)
-    to_user = UserSerializer(read_only=True)
+class ItemRecordSerializer(ModelSerializer):
+    class Meta:
+        model = Item
+        fields = ['id', 'name', 'price', 'created_by', 'created_at', 'instance']
+
+class ItemSplitRecordSerializer(ModelSerializer):
+    class Meta:
+        model = ItemSplit
+        fields = ['id', 'item', 'user', 'amount']
+
+class BalanceSerializer(ModelSerializer):
+    from_user = UserField(read_only=True)
+    to_user = UserField(read_only=True)
     
     class Meta:
         model = Balance
-        fields = ['id', 'from_user', 'to_user', 'amount']
\ No newline at end of file
+        fields = ['id', 'from_user', 'to_user', 'amount']
+
+    def to_representation(self, instance):
+        # Rows are stored in canonical user order with a signed amount;
+        # clients always see the debtor as from_user and a positive amount
+        data = super().to_representation(instance)
+        if instance.amount < 0:
+            data['from_user'], data['to_user'] = data['to_user'], data['from_user']
+            data['amount'] = self.fields['amount'].to_representation(-instance.amount)
+        return data
+
+class JobSerializer(ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'attempts', 'max_attempts', 'result', 'error', 'run_after', 'created_at', 'finished_at']
+        read_only_fields = fields
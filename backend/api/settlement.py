@@ -0,0 +1,122 @@
+"""
+Debt simplification for a group.
+
+Pairwise balances are reduced to each member's net position, then creditors
+are matched to debtors to produce as few settle-up transfers as possible.
+Small groups are solved exactly; larger ones use a greedy heap match, which
+never needs more than one transfer fewer than the number of members.
+
+Plans are cached under the group's version, which every balance change
+bumps, so each process stops serving a plan as soon as the group changes.
+"""
+import heapq
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from .models import Balance
+
+# Above this many non-zero members the exact solver's 2^n table gets too large
+EXACT_LIMIT = 12
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def cache_key(group):
+    return f'settlement:{group.id}:{group.version}'
+
+
+def net_positions(balances):
+    """
+    Net position in cents per user from (from_user_id, to_user_id, amount) rows.
+
+    Positive means the user is owed money, negative means they owe.
+    """
+    net = {}
+    for from_user_id, to_user_id, amount in balances:
+        cents = int((Decimal(amount) * 100).to_integral_value())
+        net[from_user_id] = net.get(from_user_id, 0) - cents
+        net[to_user_id] = net.get(to_user_id, 0) + cents
+    return {user_id: cents for user_id, cents in net.items() if cents}
+
+
+def greedy_transfers(net):
+    """Repeatedly settle the largest debtor against the largest creditor"""
+    creditors = [(-cents, user_id) for user_id, cents in net.items() if cents > 0]
+    debtors = [(cents, user_id) for user_id, cents in net.items() if cents < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+def exact_transfers(net):
+    """
+    Minimum number of transfers via subset DP.
+
+    A zero-sum subset of k members can always be settled with k - 1 transfers,
+    so the optimum is n minus the largest number of disjoint zero-sum subsets.
+    """
+    users = list(net)
+    values = [net[user_id] for user_id in users]
+    size = 1 << len(users)
+
+    sums = [0] * size
+    best = [0] * size
+    for mask in range(1, size):
+        low_bit = mask & -mask
+        sums[mask] = sums[mask ^ low_bit] + values[low_bit.bit_length() - 1]
+        best[mask] = max(best[mask ^ (1 << i)] for i in range(len(users)) if mask >> i & 1)
+        if sums[mask] == 0:
+            best[mask] += 1
+
+    # Walk back from the full set; zero-sum masks on the path split the groups
+    transfers = []
+    mask = size - 1
+    group = []
+    while mask:
+        target = best[mask] - (1 if sums[mask] == 0 else 0)
+        i = next(i for i in range(len(users)) if mask >> i & 1 and best[mask ^ (1 << i)] == target)
+        group.append(i)
+        mask ^= 1 << i
+        if sums[mask] == 0:
+            transfers.extend(greedy_transfers({users[j]: values[j] for j in group}))
+            group = []
+    return transfers
+
+
+def simplify(net):
+    """Return (method, [(debtor_id, creditor_id, cents), ...]) for net positions"""
+    if len(net) <= EXACT_LIMIT:
+        return 'exact', exact_transfers(net)
+    return 'greedy', greedy_transfers(net)
+
+
+def group_settlement(group):
+    """Cached settle-up plan for a group, amounts as Decimal"""
+    key = cache_key(group)
+    result = cache.get(key)
+    if result is None:
+        balances = Balance.objects.filter(group_id=group.id).values_list(
+            'from_user_id', 'to_user_id', 'amount'
+        )
+        method, transfers = simplify(net_positions(balances))
+        result = {
+            'method': method,
+            'transfers': [
+                (debtor, creditor, Decimal(cents) / 100)
+                for debtor, creditor, cents in transfers
+            ],
+        }
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
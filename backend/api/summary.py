@@ -0,0 +1,92 @@
+"""
+Maintenance of the denormalized GroupSummary row and member net positions.
+
+Writers call these helpers inside their own transaction with the change they
+just made, so the summary is updated with a single relative UPDATE instead of
+re-counting the group's items.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Balance, GroupMember, GroupSummary, Instance, Item
+
+
+def _update(group_id, **changes):
+    changes['last_activity_at'] = timezone.now()
+    if not GroupSummary.objects.filter(group_id=group_id).update(**changes):
+        # Groups created before summaries existed get one built from scratch
+        rebuild(group_id)
+
+
+def record_items(group_id, count, spend):
+    """Items were added (positive) or removed (negative) from a group"""
+    _update(group_id, item_count=F('item_count') + count, total_spend=F('total_spend') + spend)
+
+
+def record_instances(group_id, count, item_count=0, spend=Decimal('0')):
+    """Instances were added or removed, optionally taking their items with them"""
+    _update(
+        group_id,
+        instance_count=F('instance_count') + count,
+        item_count=F('item_count') + item_count,
+        total_spend=F('total_spend') + spend,
+    )
+
+
+def has_items(group_id):
+    """Whether the group has any items left, read from the summary row"""
+    summary = GroupSummary.objects.filter(group_id=group_id).values_list('item_count', flat=True).first()
+    if summary is None:
+        return Item.objects.filter(instance__group_id=group_id).exists()
+    return summary > 0
+
+
+def apply_pair_deltas(group_id, deltas):
+    """Move member net positions by ledger deltas, see ledger.apply_balance_deltas"""
+    positions = {}
+    for (low, high), delta in deltas.items():
+        # Positive delta: low owes high a further delta
+        positions[low] = positions.get(low, Decimal('0')) - delta
+        positions[high] = positions.get(high, Decimal('0')) + delta
+    for user_id, change in sorted(positions.items()):
+        if change:
+            GroupMember.objects.filter(group_id=group_id, user_id=user_id).update(
+                net_position=F('net_position') + change
+            )
+
+
+def reset_positions(group_id):
+    """All of the group's balances were cleared"""
+    GroupMember.objects.filter(group_id=group_id).update(net_position=0)
+
+
+def rebuild(group_id):
+    """Recompute a group's summary and member positions from the source tables"""
+    items = Item.objects.filter(instance__group_id=group_id).aggregate(
+        count=Count('id'), spend=Sum('price')
+    )
+    last_item = Item.objects.filter(instance__group_id=group_id).order_by('-created_at').values_list(
+        'created_at', flat=True
+    ).first()
+    GroupSummary.objects.update_or_create(
+        group_id=group_id,
+        defaults={
+            'item_count': items['count'],
+            'total_spend': items['spend'] or 0,
+            'instance_count': Instance.objects.filter(group_id=group_id).count(),
+            'last_activity_at': last_item,
+        },
+    )
+
+    positions = {}
+    for from_user_id, to_user_id, amount in Balance.objects.filter(group_id=group_id).values_list(
+        'from_user_id', 'to_user_id', 'amount'
+    ):
+        positions[from_user_id] = positions.get(from_user_id, Decimal('0')) - amount
+        positions[to_user_id] = positions.get(to_user_id, Decimal('0')) + amount
+    members = list(GroupMember.objects.filter(group_id=group_id))
+    for member in members:
+        member.net_position = positions.get(member.user_id, Decimal('0'))
+    GroupMember.objects.bulk_update(members, ['net_position'])
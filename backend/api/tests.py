@@ -1,3 +1,1284 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import QuerySet
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase as DjangoTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import authentication
+from .authentication import token_cache
+from .cache import SizedLocMemCache
+from .directory import directory
+from . import async_views, changes, deletion, jobs, routers, settlement
+from .instrumentation import registry
+from .ledger import apply_balance_deltas, reconcile
+from .models import Group, GroupMember, Instance, Item, ItemSplit, Balance, Job
+from .serializers import GroupSerializer
+
+verified_tokens = []
+
+
+def setUpModule():
+    # Under DATABASE_PROFILE=sqlite-replica the replica mirrors the in-memory test
+    # database; sharing the primary's connection lets it see each test's transaction
+    if 'replica' in connections:
+        connections['replica'] = connections['default']
+
+
+class TestCase(DjangoTestCase):
+    """
+    Row ids are reused once a test's transaction rolls back, so a cached
+    response keyed by (user, group, version), or a user's pin to the primary
+    database, must not outlive its test. With DATABASE_PROFILE=sqlite-replica
+    the read endpoints query the 'replica' mirror of the test database.
+    """
+    databases = '__all__'
+
+    def _post_teardown(self):
+        super()._post_teardown()
+        for cache in caches.all():
+            cache.clear()
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Runs data migrations against rows written with an older schema"""
+    databases = '__all__'
+
+    def migrate(self, name):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('api', name)])
+        executor.loader.build_graph()
+        return executor.loader.project_state([('api', name)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+
+class APITestCase(TestCase):
+    """Signed in as 'owner'"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', email='owner@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class GroupTestCase(APITestCase):
+    """Signed in as 'owner' of a 'Trip' group whose other members are named in `member_names`"""
+    member_names = ('friend',)
+
+    def setUp(self):
+        super().setUp()
+        self.group_id = self.client.post('/api/groups/', {'name': 'Trip'}, format='json').data['id']
+        for name in self.member_names:
+            user = User.objects.create_user(username=name, email=f'{name}@example.com')
+            GroupMember.objects.create(group_id=self.group_id, user=user)
+            setattr(self, name, user)
+
+    def add_instance(self, name='Dinner', date='2025-01-01'):
+        return self.client.post('/api/instances/', {
+            'group': self.group_id, 'name': name, 'date': date,
+        }, format='json').data['id']
+
+
+def fake_verifier(id_token):
+    """Stand-in for Firebase: tokens look like '<uid>:<seconds until expiry>'"""
+    verified_tokens.append(id_token)
+    uid, ttl = id_token.split(':')
+    return {'uid': uid, 'email': f'{uid}@example.com', 'name': 'Test User', 'exp': time.time() + int(ttl)}
+
+
+def failing_job(**payload):
+    raise RuntimeError('boom')
+
+
+class ListQueryCountTests(APITestCase):
+    """List endpoints must not issue queries per row"""
+
+    def add_group(self, member_count, instance_count, item_count):
+        group = Group.objects.create(name='Trip', created_by=self.user)
+        users = [self.user] + [
+            User.objects.create_user(username=f'user{group.id}-{i}', email=f'user{group.id}-{i}@example.com')
+            for i in range(member_count - 1)
+        ]
+        GroupMember.objects.bulk_create([GroupMember(group=group, user=user) for user in users])
+        for i in range(instance_count):
+            instance = Instance.objects.create(
+                group=group, name=f'Dinner {i}', date=date(2025, 1, 1), created_by=self.user
+            )
+            for j in range(item_count):
+                payer = users[j % len(users)]
+                item = Item.objects.create(
+                    instance=instance, name=f'Item {j}', price=Decimal('10.00'), created_by=payer
+                )
+                ItemSplit.objects.bulk_create([
+                    ItemSplit(item=item, user=user, amount=Decimal('1.00')) for user in users
+                ])
+        Balance.objects.bulk_create([
+            Balance(group=group, from_user=self.user, to_user=user, amount=Decimal('1.00'))
+            for user in users[1:]
+        ])
+
+    def query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_independent_of_row_count(self):
+        urls = ['/api/groups/', '/api/instances/', '/api/items/', '/api/balances/']
+        self.add_group(member_count=2, instance_count=1, item_count=1)
+        small = {url: self.query_count(url) for url in urls}
+
+        self.add_group(member_count=6, instance_count=4, item_count=5)
+        self.add_group(member_count=3, instance_count=2, item_count=3)
+        large = {url: self.query_count(url) for url in urls}
+
+        self.assertEqual(small, large)
+
+
+@override_settings(FIREBASE_TOKEN_VERIFIER='api.tests.fake_verifier')
+class TokenCacheTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        verified_tokens.clear()
+        self.client = APIClient()
+
+    def get_groups(self, token):
+        return self.client.get('/api/groups/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_repeated_token_is_verified_once(self):
+        self.assertEqual(self.get_groups('alice:3600').status_code, 200)
+        user = User.objects.get(username='alice')
+        self.assertEqual((user.first_name, user.last_name), ('Test', 'User'))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_groups('alice:3600').status_code, 200)
+        self.assertEqual(verified_tokens, ['alice:3600'])
+        self.assertFalse(any('"auth_user"."username" =' in query['sql'] for query in queries))
+
+    def test_expired_token_is_not_cached(self):
+        self.get_groups('bob:0')
+        self.get_groups('bob:0')
+        self.assertEqual(verified_tokens, ['bob:0', 'bob:0'])
+
+    def test_saving_user_evicts_cached_token(self):
+        self.get_groups('carol:3600')
+        User.objects.filter(username='carol').get().save()
+        self.get_groups('carol:3600')
+        self.assertEqual(len(verified_tokens), 2)
+
+
+class FirebaseTokenVerificationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.x509.oid import NameOID
+        from google.auth import crypt
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'test')])
+        now = datetime.now(dt_timezone.utc)
+        cert = (
+            x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(1).not_valid_before(now - timedelta(days=1)).not_valid_after(now + timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        cls.certs = {'known': cert.public_bytes(serialization.Encoding.PEM).decode()}
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+        )
+        cls.signer = crypt.RSASigner.from_string(pem)
+
+    def setUp(self):
+        app = mock.Mock(project_id='splitsmart-test')
+        for patcher in (mock.patch.object(authentication.certificates, 'get', return_value=self.certs),
+                        mock.patch.object(authentication, 'firebase_app', return_value=app)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def claims(self):
+        now = int(time.time())
+        return {
+            'iss': 'https://securetoken.google.com/splitsmart-test', 'aud': 'splitsmart-test',
+            'sub': 'alice', 'iat': now, 'exp': now + 3600,
+        }
+
+    def token(self, **header):
+        from google.auth import jwt
+
+        return jwt.encode(self.signer, self.claims(), header=header).decode()
+
+    def test_rs256_token_signed_by_a_known_key_is_accepted(self):
+        self.assertEqual(authentication.verify_firebase_token(self.token(kid='known'))['uid'], 'alice')
+
+    def test_other_algorithms_and_unknown_or_missing_key_ids_are_rejected(self):
+        def segment(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b'=').decode()
+
+        forged = f'{segment({"alg": "HS256", "kid": "known"})}.{segment(self.claims())}.c2ln'
+        with self.assertRaisesRegex(ValueError, 'algorithm'):
+            authentication.verify_firebase_token(forged)
+        with self.assertRaisesRegex(ValueError, 'key id'):
+            authentication.verify_firebase_token(self.token(kid='rotated-out'))
+        with self.assertRaisesRegex(ValueError, 'key id'):
+            authentication.verify_firebase_token(self.token())
+
+
+class InstrumentationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_requests_are_counted_and_exposed(self):
+        response = self.client.get('/api/balances/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 404)
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+            text = self.client.get('/api/metrics/', HTTP_X_METRICS_TOKEN='secret').content.decode()
+        self.assertIn('splitsmart_requests_total{method="GET",route="balance-list"} 1', text)
+        self.assertRegex(text, r'splitsmart_db_queries_total\{method="GET",route="balance-list"\} [1-9]')
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def test_small_run_reports_every_scenario(self):
+        out = io.StringIO()
+        call_command(
+            'benchmark', '--in-place', '--members', '4', '--items', '40', '--iterations', '2',
+            '--delete-group-items', '10', stdout=out,
+        )
+        for scenario in ('item_create', 'item_delete', 'instance_list', 'balance_list', 'group_delete'):
+            self.assertIn(scenario, out.getvalue())
+
+
+class SyncTests(GroupTestCase):
+
+    def sync(self, since):
+        response = self.client.get('/api/sync/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_feed_returns_current_rows_and_tombstones(self):
+        cursor = self.client.get('/api/sync/').data['cursor']
+        instance_id = self.add_instance()
+        item = self.client.post('/api/items/', {
+            'instance': instance_id, 'name': 'Pizza', 'price': '20.00',
+            'shared_with': [self.user.id, self.friend.id],
+        }, format='json').data
+        self.client.patch(f'/api/items/{item["id"]}/', {'name': 'Pasta'}, format='json')
+
+        changes = self.sync(cursor)
+        self.assertEqual([row['name'] for row in changes['items']], ['Pasta'])
+        self.assertEqual(len(changes['splits']), 2)
+        self.assertEqual(changes['balances'][self.group_id][0]['amount'], '10.00')
+
+        self.client.delete(f'/api/items/{item["id"]}/')
+        changes = self.sync(changes['cursor'])
+        self.assertEqual(changes['deleted']['items'], [item['id']])
+        self.assertEqual(changes['balances'], {self.group_id: []})
+
+    def test_leaving_member_gets_group_tombstone(self):
+        self.client.force_authenticate(self.friend)
+        cursor = self.client.get('/api/sync/').data['cursor']
+        self.client.post(f'/api/groups/{self.group_id}/leave_group/')
+        changes = self.sync(cursor)
+        self.assertEqual(changes['deleted']['groups'], [self.group_id])
+        self.assertEqual(changes['groups'], [])
+
+    def test_limit_pages_through_the_feed(self):
+        for i in range(3):
+            self.add_instance(f'Dinner {i}')
+        first = self.client.get('/api/sync/', {'since': 0, 'limit': 2}).data
+        self.assertTrue(first['has_more'])
+        rest = self.sync(first['cursor'])
+        self.assertFalse(rest['has_more'])
+
+
+class ListFilterTests(GroupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other_id = self.client.post('/api/groups/', {'name': 'Home'}, format='json').data['id']
+        for day in ('2025-01-01', '2025-01-02', '2025-01-03'):
+            instance_id = self.add_instance(f'Trip {day}', day)
+            self.client.post('/api/items/', {
+                'instance': instance_id, 'name': f'Pizza {day}', 'price': '10.00', 'shared_with': ['owner', 'friend'],
+            }, format='json')
+        self.client.post('/api/instances/', {'group': self.other_id, 'name': 'Home', 'date': '2025-01-02'}, format='json')
+        Item.objects.filter(name='Pizza 2025-01-02').update(created_by=self.friend)
+
+    def names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['name'] for row in response.data]
+
+    def test_filters_narrow_the_lists(self):
+        self.assertEqual(self.names(f'/api/instances/?group={self.other_id}'), ['Home'])
+        self.assertEqual(
+            self.names(f'/api/instances/?group={self.group_id}&date_after=2025-01-02'),
+            ['Trip 2025-01-02', 'Trip 2025-01-03'],
+        )
+        self.assertEqual(self.names('/api/instances/?date_before=2025-01-01'), ['Trip 2025-01-01'])
+        self.assertEqual(self.names(f'/api/items/?created_by={self.friend.id}'), ['Pizza 2025-01-02'])
+        self.assertEqual(
+            self.names('/api/items/?date_after=2025-01-02&date_before=2025-01-02'), ['Pizza 2025-01-02'],
+        )
+        self.assertEqual(self.client.get('/api/instances/?date_after=soon').status_code, 400)
+        self.assertEqual(self.client.get('/api/items/?group=x').status_code, 400)
+
+    def test_page_size_pages_through_with_cursors(self):
+        first = self.client.get('/api/instances/?page_size=2').data
+        self.assertEqual([row['name'] for row in first['results']], ['Trip 2025-01-03', 'Home'])
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        self.assertEqual([row['name'] for row in second['results']], ['Trip 2025-01-02', 'Trip 2025-01-01'])
+        self.assertIsNone(second['next'])
+
+        page = self.client.get(f'/api/items/?group={self.group_id}&page_size=2').data
+        rest = self.client.get(page['next']).data
+        self.assertEqual(
+            [row['name'] for row in page['results'] + rest['results']],
+            ['Pizza 2025-01-03', 'Pizza 2025-01-02', 'Pizza 2025-01-01'],
+        )
+
+
+class ETagTests(GroupTestCase):
+    member_names = ()
+
+    def setUp(self):
+        super().setUp()
+        self.instance_id = self.add_instance()
+
+    def test_unchanged_list_answers_304_until_a_write(self):
+        url = f'/api/instances/?group={self.group_id}'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        self.assertEqual(len(queries), 1)
+
+        self.client.post('/api/items/', {
+            'instance': self.instance_id, 'name': 'Pizza', 'price': '20.00', 'shared_with': [self.user.id],
+        }, format='json')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_etag_depends_on_the_request(self):
+        self.assertNotEqual(
+            self.client.get('/api/instances/')['ETag'],
+            self.client.get(f'/api/instances/{self.instance_id}/')['ETag'],
+        )
+
+
+class UpdateTests(GroupTestCase):
+    member_names = ()
+
+    def setUp(self):
+        super().setUp()
+        self.instance_id = self.add_instance()
+
+    def test_rows_cannot_move_between_groups(self):
+        other_id = self.client.post('/api/groups/', {'name': 'Home'}, format='json').data['id']
+        item_id = self.client.post('/api/items/', {
+            'instance': self.instance_id, 'name': 'Pizza', 'price': '20.00', 'shared_with': [self.user.id],
+        }, format='json').data['id']
+        other_instance_id = self.client.post('/api/instances/', {
+            'group': other_id, 'name': 'Lunch', 'date': '2025-01-02',
+        }, format='json').data['id']
+
+        response = self.client.patch(f'/api/instances/{self.instance_id}/', {'group': other_id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f'/api/items/{item_id}/', {'instance': other_instance_id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f'/api/instances/{self.instance_id}/', {
+            'group': self.group_id, 'name': 'Supper',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        summary = Group.objects.get(id=self.group_id).summary
+        self.assertEqual((summary.instance_count, summary.item_count, summary.total_spend), (1, 1, Decimal('20.00')))
+        self.assertEqual(Group.objects.get(id=other_id).summary.item_count, 0)
+
+
+class NonMemberWriteTests(GroupTestCase):
+
+    def test_non_members_cannot_write_into_a_group(self):
+        instance_id = self.add_instance()
+        version = Group.objects.get(id=self.group_id).version
+        self.client.force_authenticate(User.objects.create_user(username='stranger', email='stranger@example.com'))
+
+        response = self.client.post('/api/instances/', {
+            'group': self.group_id, 'name': 'Intruder', 'date': '2025-01-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('group', response.data)
+        response = self.client.post('/api/items/', {
+            'instance': instance_id, 'name': 'Pizza', 'price': '20.00', 'shared_with': ['owner', 'friend'],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('instance', response.data)
+        response = self.client.post('/api/items/bulk/', {
+            'instance': instance_id, 'items': [{'name': 'Pizza', 'price': '20.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.assertFalse(Item.objects.exists())
+        self.assertEqual(Instance.objects.count(), 1)
+        self.assertEqual(Group.objects.get(id=self.group_id).version, version)
+
+
+class RebuildBalancesTests(GroupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.post('/api/items/', {
+            'instance': self.add_instance(), 'name': 'Pizza', 'price': '30.00', 'shared_with': [self.user.id, self.friend.id],
+        }, format='json')
+
+    def rebuild(self, *args):
+        out = io.StringIO()
+        call_command('rebuild_balances', '--workers', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_consistent_group_reports_no_drift(self):
+        self.assertIn('drift in 0 group(s)', self.rebuild())
+
+    def test_repair_restores_balances_and_positions(self):
+        Balance.objects.filter(group_id=self.group_id).update(amount=Decimal('14.99'))
+        self.assertIn('found drift in 1 group(s)', self.rebuild())
+        self.assertEqual(Balance.objects.get(group_id=self.group_id).amount.copy_abs(), Decimal('14.99'))
+
+        self.assertIn('repaired drift in 1 group(s)', self.rebuild('--repair'))
+        self.assertEqual(Balance.objects.get(group_id=self.group_id).amount.copy_abs(), Decimal('15.00'))
+        positions = dict(GroupMember.objects.filter(group_id=self.group_id).values_list('user_id', 'net_position'))
+        self.assertEqual(positions, {self.user.id: Decimal('15.00'), self.friend.id: Decimal('-15.00')})
+        self.assertIn('drift in 0 group(s)', self.rebuild())
+
+
+class LedgerTests(GroupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.instance_id = self.add_instance()
+
+    def add_item(self, price, payer, shared_with):
+        self.client.force_authenticate(payer)
+        item_id = self.client.post('/api/items/', {
+            'instance': self.instance_id, 'name': 'Pizza', 'price': price, 'shared_with': shared_with,
+        }, format='json').data['id']
+        self.client.force_authenticate(self.user)
+        return item_id
+
+    def test_rows_are_stored_in_user_order_and_shown_debtor_first(self):
+        self.assertLess(self.user.id, self.friend.id)
+        self.add_item('20.00', self.friend, ['owner', 'friend'])
+        balance = Balance.objects.get(group_id=self.group_id)
+        self.assertEqual((balance.from_user_id, balance.to_user_id, balance.amount), (self.user.id, self.friend.id, Decimal('10.00')))
+
+        self.add_item('50.00', self.user, ['owner', 'friend'])
+        balance = Balance.objects.get(group_id=self.group_id)
+        self.assertEqual((balance.from_user_id, balance.to_user_id, balance.amount), (self.user.id, self.friend.id, Decimal('-15.00')))
+        [shown] = self.client.get('/api/balances/').data
+        self.assertEqual(
+            (shown['from_user']['id'], shown['to_user']['id'], shown['amount']), (self.friend.id, self.user.id, '15.00'),
+        )
+
+    def test_deleting_an_item_returns_balances_exactly_to_zero(self):
+        third = User.objects.create_user(username='third', email='third@example.com')
+        GroupMember.objects.create(group_id=self.group_id, user=third)
+        item_id = self.add_item('10.00', self.user, ['owner', 'friend', 'third'])
+        # Both others owe the owner, whose id is the lower of each pair
+        self.assertEqual(list(Balance.objects.values_list('amount', flat=True)), [Decimal('-3.33')] * 2)
+
+        self.assertEqual(self.client.delete(f'/api/items/{item_id}/').status_code, 204)
+        self.assertFalse(Balance.objects.filter(group_id=self.group_id).exists())
+        self.assertEqual(set(GroupMember.objects.filter(group_id=self.group_id).values_list('net_position', flat=True)), {0})
+
+    def test_losing_the_insert_race_adds_to_the_other_writers_row(self):
+        Balance.objects.create(group_id=self.group_id, from_user=self.user, to_user=self.friend, amount=Decimal('5.00'))
+        real_update = QuerySet.update
+        raced = []
+
+        def lose_race(queryset, **kwargs):
+            # The first UPDATE misses the row, as if another writer inserted it just after
+            if queryset.model is Balance and not raced:
+                raced.append(True)
+                return 0
+            return real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=lose_race):
+            apply_balance_deltas(self.group_id, {(self.user.id, self.friend.id): Decimal('3.00')})
+        self.assertEqual(raced, [True])
+        self.assertEqual(Balance.objects.get(group_id=self.group_id).amount, Decimal('8.00'))
+
+
+class BulkItemTests(GroupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.instance_id = self.add_instance()
+        User.objects.create_user(username='outsider', email='outsider@example.com')
+
+    def bulk(self, items):
+        return self.client.post('/api/items/bulk/', {'instance': self.instance_id, 'items': items}, format='json')
+
+    def test_creates_items_splits_and_balances(self):
+        response = self.bulk([
+            {'name': 'Pizza', 'price': '30.00', 'shared_with': ['owner', 'friend@example.com', 'outsider']},
+            {'name': 'Gift', 'price': '8.00', 'shared_with': ['friend']},
+            {'name': 'Water', 'price': '2.00'},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['name'] for item in response.data], ['Pizza', 'Gift', 'Water'])
+        # The outsider is ignored; the gift and the unshared item get no splits
+        self.assertEqual(
+            sorted((split['user']['username'], split['amount']) for split in response.data[0]['shared_with']),
+            [('friend', '15.00'), ('owner', '15.00')],
+        )
+        self.assertEqual([item['shared_with'] for item in response.data[1:]], [[], []])
+
+        balance = Balance.objects.get(group_id=self.group_id)
+        self.assertEqual((balance.from_user_id, balance.to_user_id, balance.amount), (self.user.id, self.friend.id, Decimal('-15.00')))
+        summary = Group.objects.get(id=self.group_id).summary
+        self.assertEqual((summary.item_count, summary.total_spend), (3, Decimal('40.00')))
+        self.assertEqual(reconcile(self.group_id)[1], [])
+
+    def test_rejects_more_than_a_thousand_items(self):
+        response = self.bulk([{'name': 'Item', 'price': '1.00'}] * 1001)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+        self.assertFalse(Item.objects.exists())
+
+
+class SettlementTests(GroupTestCase):
+    member_names = ('friend', 'third')
+
+    def random_positions(self, rng, members):
+        net = {user_id: rng.randint(-5000, 5000) for user_id in range(1, members)}
+        net[members] = -sum(net.values())
+        return {user_id: cents for user_id, cents in net.items() if cents}
+
+    def settle(self, net, transfers):
+        remaining = dict(net)
+        for debtor, creditor, cents in transfers:
+            self.assertGreater(cents, 0)
+            remaining[debtor] += cents
+            remaining[creditor] -= cents
+        return {user_id: cents for user_id, cents in remaining.items() if cents}
+
+    def test_transfers_settle_every_member(self):
+        rng = random.Random(3)
+        for members in (2, 5, 9, 15):
+            net = self.random_positions(rng, members)
+            self.assertEqual(self.settle(net, settlement.greedy_transfers(net)), {})
+            if members <= settlement.EXACT_LIMIT:
+                self.assertEqual(self.settle(net, settlement.exact_transfers(net)), {})
+
+    def test_exact_never_needs_more_transfers_than_greedy(self):
+        rng = random.Random(7)
+        # Two pairs that cancel out: greedy pairs the large amounts first and needs 3
+        net = {1: 500, 2: -500, 3: 300, 4: -300}
+        self.assertEqual(len(settlement.exact_transfers(net)), 2)
+        for _ in range(50):
+            net = self.random_positions(rng, rng.randint(2, 8))
+            self.assertLessEqual(len(settlement.exact_transfers(net)), len(settlement.greedy_transfers(net)))
+
+    def test_endpoint_plans_from_current_balances(self):
+        url = f'/api/groups/{self.group_id}/simplify/'
+        instance_id = self.add_instance()
+        self.client.post('/api/items/', {
+            'instance': instance_id, 'name': 'Pizza', 'price': '30.00', 'shared_with': ['owner', 'friend', 'third'],
+        }, format='json')
+        data = self.client.get(url).data
+        self.assertEqual(data['method'], 'exact')
+        self.assertEqual(
+            sorted((t['from_user']['username'], t['to_user']['username'], t['amount']) for t in data['transfers']),
+            [('friend', 'owner', '10.00'), ('third', 'owner', '10.00')],
+        )
+
+        self.client.post('/api/items/', {
+            'instance': instance_id, 'name': 'Wine', 'price': '20.00', 'shared_with': ['owner', 'third'],
+        }, format='json')
+        transfers = self.client.get(url).data['transfers']
+        self.assertEqual(
+            sorted((t['from_user']['username'], t['amount']) for t in transfers),
+            [('friend', '10.00'), ('third', '20.00')],
+        )
+
+    def test_non_members_get_404(self):
+        self.client.force_authenticate(User.objects.create_user(username='stranger'))
+        self.assertEqual(self.client.get(f'/api/groups/{self.group_id}/simplify/').status_code, 404)
+
+
+class SharedWithResolutionTests(GroupTestCase):
+    member_names = ()
+
+    def setUp(self):
+        directory.clear()
+        super().setUp()
+        self.members = [User.objects.create_user(username=f'member{i}', email=f'member{i}@example.com') for i in range(30)]
+        GroupMember.objects.bulk_create([GroupMember(group_id=self.group_id, user=user) for user in self.members])
+        self.outsider = User.objects.create_user(username='outsider', email='outsider@example.com')
+        self.instance_id = self.add_instance()
+
+    def create_item(self, shared_with):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/items/', {
+                'instance': self.instance_id, 'name': 'Feast', 'price': '310.00', 'shared_with': shared_with,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        user_queries = [q for q in queries if 'FROM "auth_user"' in q['sql'] and '"auth_user"."email" IN' in q['sql']]
+        return response.data, user_queries
+
+    def test_mixed_identifiers_resolve_in_one_query_among_members(self):
+        shared_with = [self.user.id, 'outsider@example.com'] + [
+            member.email if i % 3 == 0 else member.username if i % 3 == 1 else str(member.id)
+            for i, member in enumerate(self.members)
+        ] + ['member0@example.com']
+        item, user_queries = self.create_item(shared_with)
+        self.assertEqual(len(user_queries), 1)
+        split_users = {split['user']['id'] for split in item['shared_with']}
+        self.assertEqual(split_users, {self.user.id} | {member.id for member in self.members})
+
+        # Member names are cached now: only their ids are checked against the group
+        _, user_queries = self.create_item([i for i in shared_with if i != 'outsider@example.com'])
+        self.assertEqual(user_queries, [])
+
+    def test_identifiers_that_are_not_ids_are_ignored(self):
+        item, _ = self.create_item([self.user.id, '²', '9' * 30, '١٢'])
+        self.assertEqual([split['user']['id'] for split in item['shared_with']], [self.user.id])
+        self.assertEqual(directory.resolve({'²', '9' * 30}, self.group_id), {})
+
+    def test_renamed_user_is_not_resolved_from_cache(self):
+        self.create_item([self.user.id, 'member0'])
+        self.members[0].username = 'renamed'
+        self.members[0].save()
+        item, _ = self.create_item([self.user.id, 'member0'])
+        self.assertEqual([split['user']['id'] for split in item['shared_with']], [self.user.id])
+
+    def test_add_member_by_email(self):
+        response = self.client.post(f'/api/groups/{self.group_id}/add_member/', {'email': 'outsider@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(GroupMember.objects.filter(group_id=self.group_id, user=self.outsider).exists())
+        response = self.client.post(f'/api/groups/{self.group_id}/add_member/', {'email': 'nobody@example.com'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        for email in (5, ['outsider@example.com'], {'email': 'outsider@example.com'}):
+            response = self.client.post(f'/api/groups/{self.group_id}/add_member/', {'email': email}, format='json')
+            self.assertEqual(response.status_code, 400, email)
+
+        self.client.force_authenticate(User.objects.create_user(username='stranger'))
+        response = self.client.post(f'/api/groups/{self.group_id}/add_member/', {'email': 'member0@example.com'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(FIREBASE_TOKEN_VERIFIER='api.tests.fake_verifier')
+class AsyncReadViewTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.headers = {'Authorization': 'Bearer alice:3600'}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        self.group_id = self.client.post('/api/groups/', {'name': 'Trip'}, format='json').data['id']
+        friend = User.objects.create_user(username='friend', email='friend@example.com')
+        GroupMember.objects.create(group_id=self.group_id, user=friend)
+        for i in range(3):
+            instance_id = self.client.post('/api/instances/', {
+                'group': self.group_id, 'name': f'Dinner {i}', 'date': f'2025-01-0{i + 1}',
+            }, format='json').data['id']
+            self.client.post('/api/items/', {
+                'instance': instance_id, 'name': 'Pizza', 'price': '20.00', 'shared_with': ['alice', 'friend'],
+            }, format='json')
+        self.instance_id = instance_id
+
+    def async_get(self, url, **headers):
+        return async_to_sync(self.async_client.get)(url, headers={**self.headers, **headers})
+
+    def test_async_endpoints_match_sync_ones(self):
+        for path in ['groups/', f'groups/{self.group_id}/', 'instances/', f'instances/{self.instance_id}/',
+                     f'instances/?group={self.group_id}&date_after=2025-01-02', 'balances/']:
+            expected = self.client.get(f'/api/{path}')
+            response = self.async_get(f'/api/async/{path}')
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.json(), expected.json(), path)
+            self.assertEqual(self.async_get(f'/api/async/{path}', if_none_match=response['ETag']).status_code, 304)
+
+        page = self.async_get('/api/async/instances/?page_size=2').json()
+        self.assertEqual([row['name'] for row in page['results']], ['Dinner 2', 'Dinner 1'])
+        self.assertIn('/api/async/instances/?cursor=', page['next'])
+
+    def test_async_endpoints_require_authentication(self):
+        response = async_to_sync(self.async_client.get)('/api/async/balances/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.async_get('/api/async/instances/?group=x').status_code, 400)
+        self.assertEqual(self.async_get('/api/async/groups/999/').status_code, 404)
+
+    def test_views_without_a_queryset_fail_when_defined(self):
+        with self.assertRaisesMessage(TypeError, 'Incomplete must set queryset_for and serializer_class'):
+            class Incomplete(async_views.AsyncReadView):
+                serializer_class = GroupSerializer
+
+
+class ExportTests(GroupTestCase):
+
+    def add_expenses(self, count):
+        for i in range(count):
+            self.client.post('/api/items/', {
+                'instance': self.add_instance(f'Dinner, {i}'), 'name': 'Pizza', 'price': '20.00', 'shared_with': ['owner', 'friend'],
+            }, format='json')
+
+    def export(self, kind):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/groups/{self.group_id}/export/', {'type': kind})
+            self.assertEqual(response.status_code, 200)
+            body = b''.join(response.streaming_content).decode()
+        return body, len(queries)
+
+    def test_csv_export_lists_every_record(self):
+        self.add_expenses(2)
+        body, queries = self.export('csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([row['record'] for row in rows], ['instance'] * 2 + ['item'] * 2 + ['split'] * 4)
+        self.assertEqual(rows[0]['name'], 'Dinner, 0')
+        self.assertEqual({row['amount'] for row in rows[4:]}, {'10.00'})
+
+        self.add_expenses(5)
+        self.assertEqual(self.export('csv')[1], queries)
+
+    def test_ndjson_export(self):
+        self.add_expenses(1)
+        body, _ = self.export('ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([record['record'] for record in records], ['instance', 'item', 'split', 'split'])
+        self.assertEqual(records[1]['price'], '20.00')
+
+    def test_export_requires_membership_and_a_known_type(self):
+        self.assertEqual(self.client.get(f'/api/groups/{self.group_id}/export/', {'type': 'xml'}).status_code, 400)
+        self.client.force_authenticate(User.objects.create_user(username='stranger'))
+        self.assertEqual(self.client.get(f'/api/groups/{self.group_id}/export/').status_code, 404)
+
+
+class ImportTests(GroupTestCase):
+
+    CSV = (
+        'instance,date,item,price,payer,participants,description\n'
+        'Dinner,2025-01-01,Pizza,30.00,owner,owner;friend;third,\n'
+        'Dinner,2025-01-01,Wine,20.00,friend,owner;friend,\n'
+        'Dinner,2025-01-01,Gift,5.00,owner,friend,\n'
+        'Lunch,2025-01-02,Soup,abc,owner,owner,\n'
+        'Lunch,2025-01-02,Soup,9.00,owner,owner;stranger@example.com,\n'
+        'Lunch,2025-01-02,Bread,4.00,third@example.com,owner;third,\n'
+    )
+
+    member_names = ('friend', 'third')
+
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user(username='stranger', email='stranger@example.com')
+
+    def test_command_imports_in_chunks_and_keeps_balances_consistent(self):
+        path = os.path.join(self.tmpdir(), 'expenses.csv')
+        with open(path, 'w') as handle:
+            handle.write(self.CSV)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_expenses', str(self.group_id), path, '--chunk-size', '2', stdout=out, stderr=err)
+
+        self.assertIn('"instances": 2, "items": 4, "splits": 7, "skipped": 2', out.getvalue())
+        self.assertIn('line 5: price:', err.getvalue())
+        self.assertIn('line 6: Not members of this group: stranger@example.com', err.getvalue())
+        self.assertEqual(Instance.objects.filter(group_id=self.group_id).count(), 2)
+        self.assertEqual(reconcile(self.group_id)[1], [])
+        self.assertEqual(Group.objects.get(id=self.group_id).summary.item_count, 4)
+
+    def test_endpoint_accepts_ndjson_and_dry_runs(self):
+        lines = [
+            {'instance': 'Taxi', 'date': '2025-02-01', 'item': 'Ride', 'price': '12.00',
+             'payer': 'owner', 'participants': ['owner', 'friend']},
+            {'instance': 'Taxi', 'date': '2025-02-01', 'item': 'Tip', 'price': 2, 'payer': 'owner', 'participants': 'owner'},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines).encode()
+        url = f'/api/groups/{self.group_id}/import/'
+
+        dry = self.client.post(url, {'file': SimpleUploadedFile('taxi.ndjson', body), 'dry_run': 'true'})
+        self.assertEqual((dry.data['instances'], dry.data['items']), (1, 2))
+        self.assertFalse(Item.objects.exists())
+
+        response = self.client.post(url, {'file': SimpleUploadedFile('taxi.ndjson', body)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['items'], response.data['splits']), (2, 3))
+        self.assertEqual(Balance.objects.get(group_id=self.group_id).amount.copy_abs(), Decimal('6.00'))
+
+    def test_command_refuses_a_group_being_deleted(self):
+        path = os.path.join(self.tmpdir(), 'expenses.csv')
+        with open(path, 'w') as handle:
+            handle.write(self.CSV)
+        Group.objects.filter(id=self.group_id).update(is_deleting=True)
+        with self.assertRaisesMessage(CommandError, f'Group {self.group_id} does not exist'):
+            call_command('import_expenses', str(self.group_id), path, stdout=io.StringIO())
+        self.assertFalse(Instance.objects.exists())
+
+    def tmpdir(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        return path
+
+
+class ChunkedDeletionTests(GroupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.instance_ids = []
+        for i in range(2):
+            instance_id = self.add_instance(f'Dinner {i}')
+            self.client.post('/api/items/bulk/', {'instance': instance_id, 'items': [
+                {'name': f'Item {j}', 'price': '10.00', 'shared_with': ['owner', 'friend']} for j in range(5)
+            ]}, format='json')
+            self.instance_ids.append(instance_id)
+
+    def test_instance_delete_keeps_summary_and_balances_exact(self):
+        # A second instance where friend paid, so the group keeps a non-zero balance
+        self.client.force_authenticate(self.friend)
+        self.client.post('/api/items/', {
+            'instance': self.instance_ids[1], 'name': 'Taxi', 'price': '12.00', 'shared_with': ['owner', 'friend'],
+        }, format='json')
+        self.client.force_authenticate(self.user)
+
+        counts = deletion.delete_instance(Instance.objects.get(id=self.instance_ids[0]), chunk_size=2)
+        self.assertEqual(counts, {'splits': 10, 'items': 5})
+        self.assertFalse(Instance.objects.filter(id=self.instance_ids[0]).exists())
+        self.assertEqual(ItemSplit.objects.count(), 12)
+        summary = Group.objects.get(id=self.group_id).summary
+        self.assertEqual((summary.instance_count, summary.item_count, summary.total_spend), (1, 6, Decimal('62.00')))
+        self.assertEqual(reconcile(self.group_id)[1], [])
+        self.assertIn('drift in 0 group(s)', self.rebuild_balances())
+        positions = dict(GroupMember.objects.filter(group_id=self.group_id).values_list('user_id', 'net_position'))
+        self.assertEqual(positions, {self.user.id: Decimal('19.00'), self.friend.id: Decimal('-19.00')})
+
+        self.assertEqual(self.client.delete(f'/api/instances/{self.instance_ids[1]}/').status_code, 204)
+        self.assertFalse(Balance.objects.filter(group_id=self.group_id).exists())
+
+    def test_group_delete_purges_everything_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            deletion.mark_group_deleting(Group.objects.get(id=self.group_id))
+            # Hidden and closed for writes while the rows are still there
+            self.assertEqual(self.client.get('/api/groups/').data, [])
+            response = self.client.post('/api/instances/', {
+                'group': self.group_id, 'name': 'Late', 'date': '2025-01-01',
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            counts = deletion.purge_group(self.group_id, chunk_size=3)
+
+        self.assertEqual(counts, {'splits': 20, 'items': 10, 'instances': 2, 'balances': 1, 'members': 0})
+        self.assertFalse(Group.objects.filter(id=self.group_id).exists())
+        # Nothing below the group row was loaded into memory
+        self.assertFalse(any('"api_item"."name"' in query['sql'] for query in queries))
+
+    def test_interrupted_purge_is_finished_by_command(self):
+        deletion.mark_group_deleting(Group.objects.get(id=self.group_id))
+        out = io.StringIO()
+        call_command('purge_deleted_groups', stdout=out)
+        self.assertIn('Purged 0 instance(s), 1 group(s)', out.getvalue())
+        self.assertFalse(Item.objects.exists())
+
+    def test_interrupted_instance_delete_is_hidden_then_finished_by_command(self):
+        instance = Instance.objects.get(id=self.instance_ids[0])
+        deletion.mark_instance_deleting(instance)
+        self.assertEqual(self.client.get(f'/api/instances/{instance.id}/').status_code, 404)
+        self.assertEqual(len(self.client.get(f'/api/items/?group={self.group_id}').data), 5)
+        response = self.client.post('/api/items/', {
+            'instance': instance.id, 'name': 'Late', 'price': '1.00', 'shared_with': ['owner'],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        out = io.StringIO()
+        call_command('purge_deleted_groups', stdout=out)
+        self.assertIn('Purged 1 instance(s), 0 group(s)', out.getvalue())
+        self.assertFalse(Instance.objects.filter(id=instance.id).exists())
+        self.assertEqual(reconcile(self.group_id)[1], [])
+        self.assertEqual(Group.objects.get(id=self.group_id).summary.instance_count, 1)
+
+    def rebuild_balances(self):
+        out = io.StringIO()
+        call_command('rebuild_balances', '--workers', '1', stdout=out)
+        return out.getvalue()
+
+
+class JobQueueTests(GroupTestCase):
+    member_names = ()
+
+    @mock.patch.dict(jobs.HANDLERS, {'boom': 'api.tests.failing_job'})
+    @override_settings(JOBS_EXECUTION='worker')
+    def test_failing_job_backs_off_then_fails(self):
+        with self.assertLogs('api.jobs', 'ERROR'):
+            job = jobs.run_claimed(jobs.claim(job_id=jobs.enqueue('boom', {}, self.user, max_attempts=2).id))
+        self.assertEqual((job.status, job.attempts, job.error), (Job.QUEUED, 1, 'RuntimeError: boom'))
+        # Not runnable again until the backoff has passed
+        self.assertIsNone(jobs.claim())
+
+        Job.objects.filter(id=job.id).update(run_after=job.created_at)
+        with self.assertLogs('api.jobs', 'ERROR'):
+            job = jobs.run_claimed(jobs.claim())
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    @mock.patch.dict(jobs.HANDLERS, {'boom': 'api.tests.failing_job'})
+    def test_failing_inline_job_uses_up_its_attempts_at_once(self):
+        with self.assertLogs('api.jobs', 'ERROR') as logs:
+            job = jobs.enqueue('boom', {}, self.user, max_attempts=3)
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertEqual(self.client.get(f'/api/jobs/{job.id}/').data['status'], Job.FAILED)
+
+    def test_status_endpoint_only_shows_own_jobs(self):
+        job = jobs.enqueue('clear_empty_group_balances', {'group_id': self.group_id}, self.user)
+        response = self.client.get(f'/api/jobs/{job.id}/')
+        self.assertEqual((response.data['status'], response.data['result']), (Job.SUCCEEDED, {'deleted': 0}))
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other'))
+        self.assertEqual(other.get(f'/api/jobs/{job.id}/').status_code, 404)
+
+    def test_background_import_returns_job(self):
+        storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_dir)
+        body = b'instance,date,item,price,payer,participants\nTaxi,2025-02-01,Ride,12.00,owner,owner\n'
+        with self.settings(JOBS_STORAGE_DIR=storage_dir):
+            response = self.client.post(f'/api/groups/{self.group_id}/import/', {
+                'file': SimpleUploadedFile('taxi.csv', body), 'background': 'true',
+            })
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['kind'], 'import_expenses')
+        self.assertEqual(self.client.get(f'/api/jobs/{response.data["id"]}/').data['result']['items'], 1)
+        # The upload is removed once imported
+        self.assertEqual([name for _, _, names in os.walk(storage_dir) for name in names], [])
+
+    @override_settings(JOBS_EXECUTION='worker')
+    def test_background_import_fails_without_retry_once_uploader_has_left(self):
+        storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_dir)
+        body = b'instance,date,item,price,payer,participants\nTaxi,2025-02-01,Ride,12.00,owner,owner\n'
+        with self.settings(JOBS_STORAGE_DIR=storage_dir):
+            response = self.client.post(f'/api/groups/{self.group_id}/import/', {
+                'file': SimpleUploadedFile('taxi.csv', body), 'background': 'true',
+            })
+            GroupMember.objects.filter(group_id=self.group_id, user=self.user).delete()
+            with self.assertLogs('api.jobs', 'ERROR'):
+                job = jobs.run_claimed(jobs.claim(job_id=response.data['id']))
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIn('PermanentError', job.error)
+        self.assertFalse(Item.objects.exists())
+        self.assertEqual([name for _, _, names in os.walk(storage_dir) for name in names], [])
+
+
+@override_settings(JOBS_EXECUTION='worker')
+class RunWorkerTests(TransactionTestCase):
+    databases = '__all__'
+
+    def test_worker_drains_queued_jobs(self):
+        user = User.objects.create_user(username='owner', email='owner@example.com')
+        client = APIClient()
+        client.force_authenticate(user)
+        group_id = client.post('/api/groups/', {'name': 'Trip'}, format='json').data['id']
+
+        self.assertEqual(client.delete(f'/api/groups/{group_id}/').status_code, 204)
+        # Hidden straight away, purged by the worker
+        self.assertEqual(client.get('/api/groups/').data, [])
+        self.assertTrue(Group.objects.filter(id=group_id, is_deleting=True).exists())
+
+        out = io.StringIO()
+        # One thread: the in-memory test database locks whole tables without waiting
+        call_command('run_worker', '--once', '--threads', '1', stdout=out)
+        self.assertIn('1 succeeded, 0 failed', out.getvalue())
+        self.assertFalse(Group.objects.filter(id=group_id).exists())
+        self.assertEqual(Job.objects.get().status, Job.SUCCEEDED)
+
+
+class AnalyticsTests(GroupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for day, items in (('2025-01-05', [('Pizza', '30.00', 'owner')]),
+                           ('2025-02-10', [('Taxi', '12.00', 'friend'), ('Pizza', '18.00', 'owner')])):
+            instance_id = self.add_instance(day, day)
+            for name, price, payer in items:
+                Item.objects.filter(id=self.client.post('/api/items/', {
+                    'instance': instance_id, 'name': name, 'price': price, 'shared_with': ['owner', 'friend'],
+                }, format='json').data['id']).update(created_by=User.objects.get(username=payer))
+
+    def test_group_analytics_are_aggregated_and_cached_per_version(self):
+        url = f'/api/groups/{self.group_id}/analytics/'
+        data = self.client.get(url).data
+        self.assertEqual(data['total_spend'], '60.00')
+        self.assertEqual(data['members'], [
+            {'user_id': self.user.id, 'paid': '48.00', 'consumed': '30.00', 'ratio': 1.6},
+            {'user_id': self.friend.id, 'paid': '12.00', 'consumed': '30.00', 'ratio': 0.4},
+        ])
+        self.assertEqual(data['months'], [
+            {'month': '2025-01', 'total': '30.00', 'items': 1},
+            {'month': '2025-02', 'total': '30.00', 'items': 2},
+        ])
+        self.assertEqual(data['top_items'][0], {'name': 'Pizza', 'total': '48.00', 'count': 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse(any('"api_item"' in query['sql'] for query in queries))
+        # A write bumps the version, so the next read recomputes
+        Item.objects.filter(name='Taxi').delete()
+        changes.bump_version(self.group_id)
+        self.assertEqual(self.client.get(url).data['total_spend'], '48.00')
+
+    def test_instances_being_deleted_are_left_out(self):
+        deletion.mark_instance_deleting(Instance.objects.get(group_id=self.group_id, date=date(2025, 2, 10)))
+        data = self.client.get(f'/api/groups/{self.group_id}/analytics/').data
+        self.assertEqual((data['total_spend'], [m['month'] for m in data['months']]), ('30.00', ['2025-01']))
+        self.assertEqual(self.client.get('/api/analytics/').data['consumed'], '15.00')
+
+        response = self.client.get(f'/api/groups/{self.group_id}/export/', {'type': 'ndjson'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([record['record'] for record in records], ['instance', 'item', 'split', 'split'])
+
+    def test_user_analytics_span_groups(self):
+        other_id = self.client.post('/api/groups/', {'name': 'Home'}, format='json').data['id']
+        data = self.client.get('/api/analytics/').data
+        self.assertEqual((data['paid'], data['consumed'], data['ratio']), ('48.00', '30.00', 1.6))
+        self.assertEqual(
+            [(group['group'], group['paid'], group['ratio']) for group in data['groups']],
+            [(self.group_id, '48.00', 1.6), (other_id, '0.00', None)],
+        )
+        self.assertEqual(data['months'], [
+            {'month': '2025-01', 'paid': '30.00', 'consumed': '15.00'},
+            {'month': '2025-02', 'paid': '18.00', 'consumed': '15.00'},
+        ])
+
+
+class BalanceSummaryTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.friend = User.objects.create_user(username='friend', email='friend@example.com')
+        self.third = User.objects.create_user(username='third', email='third@example.com')
+        self.trip = Group.objects.create(name='Trip', created_by=self.user)
+        self.home = Group.objects.create(name='Home', created_by=self.user)
+        for group in (self.trip, self.home):
+            for user in (self.user, self.friend, self.third):
+                GroupMember.objects.create(group=group, user=user)
+        ids = sorted([self.user.id, self.friend.id])
+        sign = 1 if ids[0] == self.user.id else -1
+        # Owner owes friend 10 on the trip, friend owes owner 4 at home
+        Balance.objects.create(group=self.trip, from_user_id=ids[0], to_user_id=ids[1], amount=sign * Decimal('10.00'))
+        Balance.objects.create(group=self.home, from_user_id=ids[0], to_user_id=ids[1], amount=-sign * Decimal('4.00'))
+        # Third owes owner 7 on the trip; a settled pair and others' balances are ignored
+        low, high = sorted([self.user.id, self.third.id])
+        Balance.objects.create(group=self.trip, from_user_id=low, to_user_id=high,
+                               amount=Decimal('7.00') if low == self.third.id else Decimal('-7.00'))
+        Balance.objects.create(group=self.home, from_user_id=low, to_user_id=high, amount=0)
+        Balance.objects.create(group=self.trip, from_user=self.friend, to_user=self.third, amount=Decimal('3.00'))
+
+    def test_summary_nets_per_counterparty_and_group_in_one_aggregate(self):
+        with self.assertNumQueries(4):  # group versions, positions, users, group names
+            data = self.client.get('/api/balances/summary/').data
+        self.assertEqual((data['owed_to_me'], data['i_owe'], data['net']), ('7.00', '6.00', '1.00'))
+        self.assertEqual(
+            [(entry['user']['username'], entry['net']) for entry in data['counterparties']],
+            [('friend', '-6.00'), ('third', '7.00')],
+        )
+        self.assertEqual(data['counterparties'][0]['groups'], [
+            {'group': self.trip.id, 'net': '-10.00'}, {'group': self.home.id, 'net': '4.00'},
+        ])
+        self.assertEqual(data['groups'], [
+            {'group': self.trip.id, 'name': 'Trip', 'net': '-3.00'},
+            {'group': self.home.id, 'name': 'Home', 'net': '4.00'},
+        ])
+
+
+class ResponseCacheTests(GroupTestCase):
+    member_names = ()
+
+    def setUp(self):
+        super().setUp()
+        self.add_instance()
+
+    def test_repeated_reads_are_served_from_cache_until_a_write(self):
+        first = self.client.get('/api/instances/')
+        with self.assertNumQueries(1):  # just the group versions behind the key
+            second = self.client.get('/api/instances/')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        self.add_instance('Lunch', '2025-01-02')
+        self.assertEqual(len(self.client.get('/api/instances/').data), 2)
+
+    def test_sized_locmem_cache_evicts_least_recently_used_by_bytes(self):
+        cache = SizedLocMemCache('test-sized', {'OPTIONS': {'MAX_BYTES': 1000}})
+        self.addCleanup(cache.clear)
+        cache.set('a', 'x' * 400)
+        cache.set('b', 'x' * 400)
+        cache.get('a')
+        cache.set('c', 'x' * 400)
+        self.assertEqual([key for key in 'abc' if cache.get(key)], ['a', 'c'])
+        self.assertLessEqual(cache.size, 1000)
+
+        cache.set('huge', 'x' * 2000)
+        self.assertIsNone(cache.get('huge'))
+        cache.delete('a')
+        cache.delete('c')
+        self.assertEqual(cache.size, 0)
+
+
+class ReplicaRoutingTests(APITestCase):
+
+    def test_router_reads_from_replica_until_the_first_write(self):
+        router = routers.PrimaryReplicaRouter()
+        with mock.patch.dict(settings.DATABASES, {'replica': {}}):
+            self.assertEqual(router.db_for_read(Group), 'default')
+            with routers.replica_reads():
+                self.assertEqual(router.db_for_read(Group), 'replica')
+                self.assertEqual(router.db_for_write(Group), 'default')
+                self.assertEqual(router.db_for_read(Group), 'default')
+        with mock.patch.dict(settings.DATABASES), routers.replica_reads():
+            settings.DATABASES.pop('replica', None)
+            self.assertEqual(router.db_for_read(Group), 'default')
+
+    def test_read_endpoints_use_replica_unless_user_just_wrote(self):
+        routed = []
+
+        def record(router, model, **hints):
+            routed.append(routers.reading_from_replica())
+            return 'default'
+
+        with mock.patch.object(routers, 'replica_configured', return_value=True), \
+                mock.patch.object(routers.PrimaryReplicaRouter, 'db_for_read', record):
+            self.client.get('/api/balances/')
+            self.assertTrue(routed and all(routed))
+
+            routed.clear()
+            self.client.post('/api/groups/', {'name': 'Trip'}, format='json')
+            self.assertFalse(any(routed))
+
+            # Read-after-write: the user stays on the primary for a while
+            routed.clear()
+            self.client.get('/api/balances/')
+            self.assertFalse(any(routed))
+
+    def test_pin_is_kept_where_every_worker_sees_it(self):
+        self.client.post('/api/groups/', {'name': 'Trip'}, format='json')
+        self.assertTrue(caches['responses'].get(routers._pin_key(self.user.pk)))
+        caches['default'].clear()
+        self.assertTrue(routers.pinned_to_primary(self.user.pk))
+
+    def test_postgres_replica_requires_a_shared_cache(self):
+        env = {**os.environ, 'DATABASE_PROFILE': 'postgres', 'DB_REPLICA_HOST': 'replica', 'RESPONSE_CACHE': 'locmem'}
+        probe = [sys.executable, '-c', 'import splitsmart.settings']
+        failed = subprocess.run(probe, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        self.assertIn('needs a shared RESPONSE_CACHE', failed.stderr)
+        shared = subprocess.run(probe, cwd=settings.BASE_DIR, env={**env, 'RESPONSE_CACHE': 'file'})
+        self.assertEqual(shared.returncode, 0)
+
+
+class CompactFormatTests(GroupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.post('/api/items/bulk/', {'instance': self.add_instance(), 'items': [
+            {'name': f'Item {i}', 'price': '10.00', 'shared_with': ['owner', 'friend']} for i in range(5)
+        ]}, format='json')
+
+    def test_users_are_sideloaded_once(self):
+        full = self.client.get('/api/instances/')
+        compact = self.client.get('/api/instances/?format=compact')
+        body = json.loads(compact.content)
+
+        self.assertEqual(set(body['users']), {str(self.user.id), str(self.friend.id)})
+        self.assertEqual(body['users'][str(self.friend.id)]['username'], 'friend')
+        item = body['data'][0]['items'][0]
+        self.assertEqual(item['created_by'], self.user.id)
+        self.assertEqual({split['user'] for split in item['shared_with']}, {self.user.id, self.friend.id})
+        self.assertEqual(item['price'], full.data[0]['items'][0]['price'])
+        self.assertEqual(compact.content.count(b'"username"'), 2)
+        self.assertLess(len(compact.content), len(full.content) * 0.6)
+
+        # Plain JSON is unchanged, and a cached compact response keeps its users
+        self.assertEqual(full.data[0]['created_by']['username'], 'owner')
+        again = json.loads(self.client.get('/api/instances/?format=compact').content)
+        self.assertEqual(again, body)
+
+    def test_accept_header_selects_compact(self):
+        response = self.client.get('/api/balances/', HTTP_ACCEPT='application/vnd.splitsmart.compact+json')
+        body = json.loads(response.content)
+        balance = body['data'][0]
+        self.assertEqual({balance['from_user'], balance['to_user']}, {self.user.id, self.friend.id})
+        self.assertEqual(len(body['users']), 2)
+
+
+class DataMigrationTests(MigrationTestCase):
+
+    def test_directional_balances_merge_into_canonical_rows(self):
+        apps = self.migrate('0001_initial')
+        User = apps.get_model('auth', 'User')
+        a, b, c = (User.objects.create(username=name) for name in 'abc')
+        group = apps.get_model('api', 'Group').objects.create(name='Trip', created_by=a)
+        Balance = apps.get_model('api', 'Balance')
+        for from_user, to_user, amount in ((a, b, '10.00'), (b, a, '4.00'), (c, b, '3.00'), (a, c, '5.00'), (c, a, '5.00')):
+            Balance.objects.create(group=group, from_user=from_user, to_user=to_user, amount=Decimal(amount))
+
+        apps = self.migrate('0002_canonical_balances')
+        rows = apps.get_model('api', 'Balance').objects.order_by('from_user_id', 'to_user_id')
+        # a and c settled; c owing b is stored as b owing c a negative amount
+        self.assertEqual(
+            [(row.from_user_id, row.to_user_id, row.amount) for row in rows],
+            [(a.id, b.id, Decimal('6.00')), (b.id, c.id, Decimal('-3.00'))],
+        )
+
+    def test_duplicate_memberships_keep_one_position(self):
+        apps = self.migrate('0001_initial')
+        User = apps.get_model('auth', 'User')
+        owner = User.objects.create(username='owner')
+        friend = User.objects.create(username='friend')
+        group = apps.get_model('api', 'Group').objects.create(name='Trip', created_by=owner)
+        GroupMember = apps.get_model('api', 'GroupMember')
+        GroupMember.objects.create(group=group, user=owner)
+        GroupMember.objects.create(group=group, user=friend)
+        GroupMember.objects.create(group=group, user=friend, is_admin=True)
+        apps.get_model('api', 'Balance').objects.create(group=group, from_user=friend, to_user=owner, amount=Decimal('10.00'))
+
+        apps = self.migrate('0005_unique_constraints_and_indexes')
+        members = apps.get_model('api', 'GroupMember').objects.filter(user__username='friend')
+        self.assertEqual([(m.net_position, m.is_admin) for m in members], [(Decimal('-10.00'), True)])
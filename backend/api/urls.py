@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, GroupViewSet, InstanceViewSet, ItemViewSet, BalanceViewSet
+from .async_views import AsyncBalanceView, AsyncGroupView, AsyncInstanceView
+from .instrumentation import metrics_view
+from .views import AnalyticsView, UserViewSet, GroupViewSet, InstanceViewSet, ItemViewSet, BalanceViewSet, JobViewSet, SyncView
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -8,7 +10,16 @@ router.register(r'groups', GroupViewSet, basename='group')
 router.register(r'instances', InstanceViewSet, basename='instance')
 router.register(r'items', ItemViewSet, basename='item')
 router.register(r'balances', BalanceViewSet, basename='balance')
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
+    path('metrics/', metrics_view, name='metrics'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('async/groups/', AsyncGroupView.as_view(), name='async-group-list'),
+    path('async/groups/<int:pk>/', AsyncGroupView.as_view(), name='async-group-detail'),
+    path('async/instances/', AsyncInstanceView.as_view(), name='async-instance-list'),
+    path('async/instances/<int:pk>/', AsyncInstanceView.as_view(), name='async-instance-detail'),
+    path('async/balances/', AsyncBalanceView.as_view(), name='async-balance-list'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,16 +1,66 @@
+import logging
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.contrib.auth.models import User
-from django.db.models import Sum, Q, Count
-from .models import Group, GroupMember, Instance, Item, ItemSplit, Balance
+from django.db import transaction
+from django.db.models import Q, Prefetch
+from . import analytics, changes, deletion, export, jobs, settlement, summary
+from .directory import directory
+from .importer import ExpenseImporter, read_rows
+from .etags import ConditionalGetMixin
+from .filters import QueryParamFilter
+from .ledger import apply_balance_deltas, item_balance_deltas, reverse_deltas, split_amount, user_positions
+from .models import ChangeLog, Group, GroupMember, GroupSummary, Instance, Item, ItemSplit, Balance, Job
+from .pagination import InstancePagination, KeysetPagination
+from .routers import ReplicaReadMixin
 from .serializers import (
     UserSerializer, GroupSerializer, InstanceSerializer,
-    ItemSerializer, BalanceSerializer
+    ItemSerializer, BalanceSerializer, BulkItemSerializer,
+    InstanceRecordSerializer, ItemRecordSerializer, ItemSplitRecordSerializer, JobSerializer
 )
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+logger = logging.getLogger(__name__)
+
+def item_queryset():
+    """Items with everything ItemSerializer touches loaded up front"""
+    return Item.objects.select_related('created_by').prefetch_related(
+        Prefetch('splits', queryset=ItemSplit.objects.select_related('user'))
+    )
+
+def group_queryset(user):
+    """The user's groups with everything GroupSerializer touches"""
+    return Group.objects.filter(
+        members=user
+    ).select_related('created_by', 'summary').prefetch_related('members', 'groupmember_set')
+
+def instance_queryset(user):
+    return Instance.objects.filter(
+        group__members=user, is_deleting=False
+    ).select_related('created_by').prefetch_related(
+        Prefetch('items', queryset=item_queryset())
+    )
+
+def balance_queryset(user):
+    """Balances in the user's groups that involve the user"""
+    return Balance.objects.filter(
+        group__members=user
+    ).filter(
+        Q(from_user=user) | Q(to_user=user)
+    ).select_related('from_user', 'to_user')
+
+def clean_up_balances(group, user):
+    """Queue clearing a group's balances once its last item has been deleted"""
+    if not summary.has_items(group.id):
+        jobs.enqueue('clear_empty_group_balances', {'group_id': group.id}, user)
+
+class UserViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -22,14 +72,15 @@ from django.db.models import Q
 from .models import Group, GroupMember
 from .serializers import GroupSerializer
 
-class GroupViewSet(viewsets.ModelViewSet):
+class GroupViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         """Return only groups that the current user is a member of"""
-        return Group.objects.filter(members=self.request.user)
+        return group_queryset(self.request.user)
     
+    @transaction.atomic
     def perform_create(self, serializer):
         """Set the current user as the created_by field and add them as a member"""
         group = serializer.save(created_by=self.request.user)
@@ -39,13 +90,19 @@ class GroupViewSet(viewsets.ModelViewSet):
             user=self.request.user,
             is_admin=True
         )
+        GroupSummary.objects.create(group=group)
+        changes.record(group.id, ChangeLog.GROUP, [group.id])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        # save() writes every column; re-read the version under the row lock so
+        # it can't roll back a concurrent bump
+        serializer.instance.version = Group.objects.select_for_update().values_list(
+            'version', flat=True
+        ).get(pk=serializer.instance.pk)
+        group = serializer.save()
+        changes.record(group.id, ChangeLog.GROUP, [group.id])
         
-    def create(self, request, *args, **kwargs):
-        """Override create to add debug logging"""
-        print("Create group request received:", request.data)
-        print("Request user:", request.user)
-        return super().create(request, *args, **kwargs)
-    
     def get_object(self):
         """Get a specific group and verify the user has permission"""
         queryset = self.filter_queryset(self.get_queryset())
@@ -61,10 +118,15 @@ class GroupViewSet(viewsets.ModelViewSet):
         group = self.get_object()
         user = request.user
         try:
-            membership = GroupMember.objects.get(group=group, user=user)
-            membership.delete()
-            if GroupMember.objects.filter(group=group).count() == 0:
-                group.delete()
+            with transaction.atomic():
+                membership = GroupMember.objects.get(group=group, user=user)
+                membership.delete()
+                changes.record_access_lost(group.id, [user.id])
+                last_member = not GroupMember.objects.filter(group=group).exists()
+                if not last_member:
+                    changes.record(group.id, ChangeLog.GROUP, [group.id])
+            if last_member:
+                deletion.delete_group(group, user)
                 return Response({'status': 'group deleted as you were the last member'})
             return Response({'status': 'you have left the group'})
         except GroupMember.DoesNotExist:
@@ -75,271 +137,412 @@ class GroupViewSet(viewsets.ModelViewSet):
     def add_member(self, request, pk=None):
         """Add a new member to the group by email"""
         group = self.get_object()
-        email = request.data.get('email')
-        
-        from django.contrib.auth.models import User
-        try:
-            user = User.objects.get(email=email)
-            # Check if user is already a member
-            if GroupMember.objects.filter(group=group, user=user).exists():
-                return Response({'error': 'User is already a member of this group'}, 
-                            status=status.HTTP_400_BAD_REQUEST)
-            GroupMember.objects.create(group=group, user=user)
-            return Response({'status': 'member added'})
-        except User.DoesNotExist:
+        if group is None:
+            return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+        email = request.data.get('email') or ''
+        if not isinstance(email, str):
+            return Response({'error': 'email must be a string'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = directory.resolve([email], lookups=('email',)).get(email.strip())
+        if user_id is None:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        # Check if user is already a member
+        if GroupMember.objects.filter(group=group, user_id=user_id).exists():
+            return Response({'error': 'User is already a member of this group'}, 
+                        status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            GroupMember.objects.create(group=group, user_id=user_id)
+            changes.record(group.id, ChangeLog.GROUP, [group.id])
+        return Response({'status': 'member added'})
     
+    @action(detail=True, methods=['get'])
+    def simplify(self, request, pk=None):
+        """Return the fewest transfers that settle every balance in the group"""
+        group = self.get_object()
+        if group is None:
+            return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        plan = settlement.group_settlement(group)
+        user_ids = {user_id for debtor, creditor, _ in plan['transfers'] for user_id in (debtor, creditor)}
+        users = {user.id: user for user in User.objects.filter(id__in=user_ids)}
+        return Response({
+            'group': group.id,
+            'method': plan['method'],
+            'transfers': [
+                {
+                    'from_user': UserSerializer(users[debtor]).data,
+                    'to_user': UserSerializer(users[creditor]).data,
+                    'amount': f'{amount:.2f}',
+                }
+                for debtor, creditor, amount in plan['transfers']
+            ],
+        })
+
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """Per-member paid/consumed, monthly totals and top items, see api.analytics"""
+        group = self.get_object()
+        if group is None:
+            return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(analytics.group_analytics(group))
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """Stream every instance, item and split of the group as ?type=csv (default) or ndjson"""
+        group = self.get_object()
+        if group is None:
+            return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+        kind = request.query_params.get('type', 'csv')
+        if kind not in export.CONTENT_TYPES:
+            return Response({'error': 'type must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(export.stream_ledger(group.id, kind), content_type=export.CONTENT_TYPES[kind])
+        response['Content-Disposition'] = f'attachment; filename="group-{group.id}.{kind}"'
+        return response
+
+    @action(detail=True, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_expenses(self, request, pk=None):
+        """
+        Import expenses from an uploaded CSV or NDJSON `file`, see api.importer.
+
+        Rows are committed a chunk at a time; invalid ones are skipped and
+        listed in the report. Pass dry_run=true to only validate, and
+        background=true to queue the import and get its job back with a 202.
+        """
+        group = self.get_object()
+        if group is None:
+            return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        kind = request.data.get('type') or ('ndjson' if upload.name.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if kind not in export.CONTENT_TYPES:
+            return Response({'error': 'type must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = request.data.get('dry_run') in ('true', '1')
+        if request.data.get('background') in ('true', '1'):
+            name = jobs.storage().save(f'imports/group-{group.id}.{kind}', upload)
+            job = jobs.enqueue('import_expenses', {
+                'group_id': group.id, 'user_id': request.user.id, 'name': name, 'kind': kind, 'dry_run': dry_run,
+            }, request.user)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        importer = ExpenseImporter(group, request.user, dry_run=dry_run)
+        return Response(importer.run(read_rows(upload, kind)))
+
     def perform_destroy(self, instance):
-        """Delete group and all related balances"""
-        from .models import Balance
-        # Delete all balances for this group
-        Balance.objects.filter(group=instance).delete()
-        # Then delete the group (will cascade delete instances, items, etc.)
-        instance.delete()
+        """Delete group and everything in it, in chunks (see api.deletion)"""
+        deletion.delete_group(instance, self.request.user)
     
-class InstanceViewSet(viewsets.ModelViewSet):
+class InstanceViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = InstanceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = InstancePagination
+    filter_backends = [QueryParamFilter]
+    filter_lookups = {
+        'group': 'group_id',
+        'created_by': 'created_by_id',
+        'date_after': 'date__gte',
+        'date_before': 'date__lte',
+    }
     
     def get_queryset(self):
-        return Instance.objects.filter(group__members=self.request.user)
+        return instance_queryset(self.request.user)
     
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        instance = serializer.save(created_by=self.request.user)
+        summary.record_instances(instance.group_id, 1)
+        changes.record(instance.group_id, ChangeLog.INSTANCE, [instance.id])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        # The serializer keeps instances in their group
+        instance = serializer.save()
+        changes.record(instance.group_id, ChangeLog.INSTANCE, [instance.id])
     
     def perform_destroy(self, instance):
         """Handle balance cleanup when an instance is deleted"""
         group = instance.group
-        # Delete the instance first (this will cascade delete all items)
-        instance.delete()
-        
-        # Check if group has any remaining items
-        item_count = Item.objects.filter(instance__group=group).count()
-        if item_count == 0:
-            # No items left in the group, clean up all balances
-            deleted_count = Balance.objects.filter(group=group).delete()[0]
-            print(f"Cleaned up {deleted_count} balances for group {group.name} as it has no items")
+        # Items and splits go in chunks, each updating the summary as it goes
+        deletion.delete_instance(instance)
+        clean_up_balances(group, self.request.user)
 
 
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [QueryParamFilter]
+    filter_lookups = {
+        'group': 'instance__group_id',
+        'created_by': 'created_by_id',
+        'date_after': 'instance__date__gte',
+        'date_before': 'instance__date__lte',
+    }
     
     def get_queryset(self):
-        return Item.objects.filter(instance__group__members=self.request.user)
+        return item_queryset().filter(instance__group__members=self.request.user, instance__is_deleting=False)
     
+    @transaction.atomic
     def perform_create(self, serializer):
-        instance_id = self.request.data.get('instance')
-        instance = Instance.objects.get(id=instance_id)
-
-        print(f"Creating item by user: {self.request.user.username}, email: {self.request.user.email}")
+        instance = serializer.validated_data['instance']
 
         item = serializer.save(created_by=self.request.user, instance=instance)
+        summary.record_items(instance.group_id, 1, item.price)
+        changes.record(instance.group_id, ChangeLog.ITEM, [item.id])
 
         shared_with_ids = self.request.data.get('shared_with', [])
-        print(f"Shared with IDs: {shared_with_ids}")
 
         if not shared_with_ids:
-            print("No users shared with — skipping split creation")
             return
 
-        # Resolve users
-        users = []
-        for id_or_username in shared_with_ids:
-            user = (
-                User.objects.filter(id=id_or_username).first() or
-                User.objects.filter(username=id_or_username).first() or
-                User.objects.filter(email=id_or_username).first()
-            )
-            if user and user not in users:
-                users.append(user)
-
-        for user in users:
-            print(f"Found user to share with: id={user.id}, username={user.username}, email={user.email}")
-
-        if not users:
-            print(f"No users found for IDs/usernames: {shared_with_ids}")
-            return
+        # Resolve ids, usernames and emails among the group's members in one query
+        user_ids = directory.resolve_list(shared_with_ids, instance.group_id)
 
-        payer = item.created_by
+        if not user_ids:
+            logger.debug("No users found for shared_with %s on item %s", shared_with_ids, item.id)
+            return
 
         # If the payer is not in the split, treat it as a gift and skip balances
-        if payer not in users:
-            print("Payer is not part of the shared_with list — skipping balance creation")
+        if item.created_by_id not in user_ids:
+            logger.debug("Payer is not part of item %s's split, skipping balances", item.id)
             return
 
-        split_amount = item.price / len(users)
+        amount = split_amount(item.price, len(user_ids))
 
         # Create item splits
-        for user in users:
-            ItemSplit.objects.create(
-                item=item,
-                user=user,
-                amount=split_amount
-            )
-
-        # Exclude payer from balance calculations (they already paid)
-        users_to_bill = [u for u in users if u != payer]
-
-        if not users_to_bill:
-            print("Only payer is included — no one owes money")
-            return
+        splits = ItemSplit.objects.bulk_create([
+            ItemSplit(item=item, user_id=user_id, amount=amount) for user_id in user_ids
+        ])
+        changes.record(instance.group_id, ChangeLog.SPLIT, [split.id for split in splits])
 
-        # Update balances for other users
-        self._update_balances(item, users_to_bill, split_amount)
+        # Update balances for other users (the payer's own share nets out)
+        self._update_balances(item, splits)
 
-    def _update_balances(self, item, users, split_amount):
-        payer = item.created_by
-        instance = item.instance
-        group = instance.group
-        
-        print(f"Updating balances: item={item.name}, payer={payer.username}, users={[u.username for u in users]}, amount={split_amount}")
-        
-        for user in users:
-            if user != payer:
-                # Look for existing balance in either direction
-                balance = Balance.objects.filter(
-                    group=group,
-                    from_user=user,
-                    to_user=payer
-                ).first()
-                
-                opposite_balance = Balance.objects.filter(
-                    group=group,
-                    from_user=payer,
-                    to_user=user
-                ).first()
-                
-                if opposite_balance:
-                    # If there's an opposite direction balance, reduce it first
-                    if opposite_balance.amount >= split_amount:
-                        opposite_balance.amount -= split_amount
-                        if opposite_balance.amount > 0:
-                            opposite_balance.save()
-                            print(f"Reduced opposite balance: {payer.username} owes {user.username} ${opposite_balance.amount}")
-                        else:
-                            opposite_balance.delete()
-                            print(f"Deleted zero balance between {payer.username} and {user.username}")
-                    else:
-                        # If the opposite balance is smaller, zero it out and create a new one
-                        remaining = split_amount - opposite_balance.amount
-                        opposite_balance.delete()
-                        
-                        # Create or update balance in the other direction
-                        balance, created = Balance.objects.get_or_create(
-                            group=group,
-                            from_user=user,
-                            to_user=payer,
-                            defaults={'amount': remaining}
-                        )
-                        
-                        if not created:
-                            balance.amount += remaining
-                            balance.save()
-                        
-                        print(f"Created/updated balance: {user.username} owes {payer.username} ${balance.amount}")
-                else:
-                    # No opposite balance, just create or update
-                    balance, created = Balance.objects.get_or_create(
-                        group=group,
-                        from_user=user,
-                        to_user=payer,
-                        defaults={'amount': split_amount}
-                    )
-                    
-                    if not created:
-                        balance.amount += split_amount
-                        balance.save()
-                    
-                    print(f"Updated balance: {user.username} owes {payer.username} ${balance.amount}")
-    
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_price = serializer.instance.price
+        item = serializer.save()
+        if item.price != old_price:
+            summary.record_items(item.instance.group_id, 0, item.price - old_price)
+        changes.record(item.instance.group_id, ChangeLog.ITEM, [item.id])
+
+    def _update_balances(self, item, splits):
+        deltas = item_balance_deltas(
+            item.created_by_id, ((split.user_id, split.amount) for split in splits)
+        )
+        apply_balance_deltas(item.instance.group_id, deltas)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create many items for one instance in a single transaction"""
+        serializer = BulkItemSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        instance = serializer.validated_data['instance']
+        entries = serializer.validated_data['items']
+        payer = request.user
+
+        resolved = directory.resolve(
+            {identifier for entry in entries for identifier in entry['shared_with']}, instance.group_id
+        )
+
+        with transaction.atomic():
+            items = Item.objects.bulk_create([
+                Item(instance=instance, name=entry['name'], price=entry['price'], created_by=payer)
+                for entry in entries
+            ])
+
+            splits = []
+            deltas = {}
+            for item, entry in zip(items, entries):
+                user_ids = list(dict.fromkeys(
+                    resolved[identifier.strip()] for identifier in entry['shared_with'] if identifier.strip() in resolved
+                ))
+
+                # Same rules as perform_create: no split without users, gifts skip balances
+                if not user_ids or payer.id not in user_ids:
+                    continue
+
+                amount = split_amount(item.price, len(user_ids))
+                splits.extend(
+                    ItemSplit(item=item, user_id=user_id, amount=amount)
+                    for user_id in user_ids
+                )
+                item_balance_deltas(payer.id, ((user_id, amount) for user_id in user_ids), deltas)
+
+            ItemSplit.objects.bulk_create(splits)
+            apply_balance_deltas(instance.group_id, deltas)
+            summary.record_items(instance.group_id, len(items), sum(item.price for item in items))
+            changes.record(instance.group_id, ChangeLog.ITEM, [item.id for item in items])
+            changes.record(instance.group_id, ChangeLog.SPLIT, [split.id for split in splits])
+
+        created = item_queryset().filter(pk__in=[item.pk for item in items])
+        return Response(ItemSerializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+    @transaction.atomic
     def perform_destroy(self, instance):
         """Handle balance adjustments when an item is deleted"""
-        # Get all the splits for this item
-        splits = ItemSplit.objects.filter(item=instance)
-        payer = instance.created_by
         group = instance.instance.group
-        
-        print(f"Deleting item: {instance.name}, adjusting balances")
-        
-        # Adjust balances for each split
-        for split in splits:
-            user = split.user
-            split_amount = split.amount
-            
-            if user != payer:
-                # First try to find direct balance where user owes payer
-                balance = Balance.objects.filter(
-                    group=group,
-                    from_user=user,
-                    to_user=payer
-                ).first()
-                
-                if balance:
-                    # Reduce the balance
-                    balance.amount -= split_amount
-                    if balance.amount <= 0.001:  # Handle floating point precision
-                        balance.delete()
-                        print(f"Deleted balance: {user.username} no longer owes {payer.username}")
-                    else:
-                        balance.save()
-                        print(f"Reduced balance: {user.username} now owes {payer.username} ${balance.amount}")
-                else:
-                    # If no direct balance found, we need to increase the opposite balance
-                    opposite_balance = Balance.objects.filter(
-                        group=group,
-                        from_user=payer,
-                        to_user=user
-                    ).first()
-                    
-                    if opposite_balance:
-                        opposite_balance.amount += split_amount
-                        opposite_balance.save()
-                        print(f"Increased opposite balance: {payer.username} now owes {user.username} ${opposite_balance.amount}")
-                    else:
-                        # Create new balance in opposite direction
-                        Balance.objects.create(
-                            group=group,
-                            from_user=payer,
-                            to_user=user,
-                            amount=split_amount
-                        )
-                        print(f"Created new balance: {payer.username} now owes {user.username} ${split_amount}")
-        
+        splits = ItemSplit.objects.filter(item=instance).values_list('user_id', 'amount')
+
+        # Undo exactly what the item's splits added
+        deltas = reverse_deltas(item_balance_deltas(instance.created_by_id, splits))
+        apply_balance_deltas(group.id, deltas)
+
         # Now actually delete the item
+        changes.record(group.id, ChangeLog.ITEM, [instance.id], deleted=True)
         instance.delete()
-        
+        summary.record_items(group.id, -1, -instance.price)
+
         # Check if this group has any remaining items
-        self._clean_up_balances(group)
-    
-    def _clean_up_balances(self, group):
-        """Clean up balances if no items exist in the group"""
-        # Count items in this group across all instances
-        item_count = Item.objects.filter(instance__group=group).count()
-        
-        if item_count == 0:
-            # No items left in the group, clean up all balances
-            deleted_count = Balance.objects.filter(group=group).delete()[0]
-            print(f"Cleaned up {deleted_count} balances for group {group.name} as it has no items")
+        clean_up_balances(group, self.request.user)
 
 
-class BalanceViewSet(viewsets.ReadOnlyModelViewSet):
+class BalanceViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = BalanceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [QueryParamFilter]
+    filter_lookups = {'group': 'group_id'}
+    replica_actions = ('list', 'retrieve', 'summary')
     
     def get_queryset(self):
         # Get all balances where the user is involved
-        user = self.request.user
-        print(f"Getting balances for user: id={user.id}, username={user.username}, email={user.email}")
-        
-        balances = Balance.objects.filter(
-            group__members=user
-        ).filter(
-            Q(from_user=user) | Q(to_user=user)
+        return balance_queryset(self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        The user's net position per counterparty and per group.
+
+        Amounts are what the other side owes the user, negative when the
+        user owes them; pairs that net to zero are left out.
+        """
+        return self.conditional(request, self._summary)
+
+    def _summary(self, request):
+        positions = user_positions(request.user.id)
+        users = {user.id: user for user in User.objects.filter(id__in={row[1] for row in positions})}
+        names = dict(Group.objects.filter(id__in={row[0] for row in positions}).values_list('id', 'name'))
+
+        counterparties, groups = {}, {}
+        for group_id, counterparty_id, net in positions:
+            entry = counterparties.setdefault(counterparty_id, {'net': Decimal('0'), 'groups': []})
+            entry['net'] += net
+            entry['groups'].append({'group': group_id, 'net': f'{net:.2f}'})
+            groups[group_id] = groups.get(group_id, Decimal('0')) + net
+
+        owed = sum((entry['net'] for entry in counterparties.values() if entry['net'] > 0), Decimal('0'))
+        owing = sum((entry['net'] for entry in counterparties.values() if entry['net'] < 0), Decimal('0'))
+        return Response({
+            'owed_to_me': f'{owed:.2f}',
+            'i_owe': f'{-owing:.2f}',
+            'net': f'{owed + owing:.2f}',
+            'counterparties': [
+                {'user': UserSerializer(users[user_id]).data, 'net': f'{entry["net"]:.2f}', 'groups': entry['groups']}
+                for user_id, entry in sorted(counterparties.items(), key=lambda item: item[1]['net'])
+                if entry['net']
+            ],
+            'groups': [
+                {'group': group_id, 'name': names[group_id], 'net': f'{net:.2f}'}
+                for group_id, net in sorted(groups.items())
+                if net
+            ],
+        })
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status of background jobs the user started"""
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(created_by=self.request.user).order_by('-id')
+
+
+class SyncView(APIView):
+    """
+    Changes since a cursor, for clients that keep a local copy.
+
+    Call without `since` to get the current cursor, then load the data with
+    the list endpoints and poll with `?since=<cursor>`. Rows come back in
+    their current state, one record per row however often it changed;
+    `deleted` lists ids to drop and `balances` replaces the balance set of
+    each group it names. A group that shows up here for the first time (the
+    user was just added) should be loaded in full.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 5000
+
+    RECORDS = {
+        ChangeLog.GROUP: ('groups', lambda ids, group_ids: Group.objects.filter(id__in=ids & group_ids)
+                          .select_related('created_by', 'summary').prefetch_related('members', 'groupmember_set'),
+                          GroupSerializer),
+        ChangeLog.INSTANCE: ('instances', lambda ids, group_ids: Instance.objects.filter(id__in=ids, group_id__in=group_ids, is_deleting=False),
+                             InstanceRecordSerializer),
+        ChangeLog.ITEM: ('items', lambda ids, group_ids: Item.objects.filter(id__in=ids, instance__group_id__in=group_ids),
+                         ItemRecordSerializer),
+        ChangeLog.SPLIT: ('splits', lambda ids, group_ids: ItemSplit.objects.filter(id__in=ids, item__instance__group_id__in=group_ids),
+                          ItemSplitRecordSerializer),
+    }
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since in (None, ''):
+            latest = ChangeLog.objects.order_by('-id').values_list('id', flat=True).first()
+            return Response({'cursor': latest or 0})
+        try:
+            since = int(since)
+            limit = min(int(request.query_params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0 or limit < 1:
+            return Response({'error': 'since and limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        group_ids = set(GroupMember.objects.filter(user=user).values_list('group_id', flat=True))
+        entries = list(
+            ChangeLog.objects.filter(id__gt=since)
+            .filter(Q(group_id__in=group_ids, user_id__isnull=True) | Q(user_id=user.id))
+            .order_by('id')
+            .values_list('id', 'group_id', 'model', 'object_id', 'deleted')[:limit + 1]
         )
-        
-        print(f"Found {balances.count()} balances")
-        for balance in balances:
-            print(f"Balance: {balance.from_user.username} owes {balance.to_user.username} ${balance.amount}")
-        
-        return balances
\ No newline at end of file
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        # Later entries for the same row win
+        latest, balance_groups = {}, set()
+        for _, group_id, model, object_id, deleted in entries:
+            if model == ChangeLog.BALANCE:
+                balance_groups.add(group_id)
+            else:
+                latest[(model, object_id)] = deleted
+
+        data = {'cursor': entries[-1][0] if entries else since, 'has_more': has_more}
+        deleted = {name: [] for name, _, _ in self.RECORDS.values()}
+        for model, (name, queryset, serializer_class) in self.RECORDS.items():
+            ids = {object_id for (kind, object_id), gone in latest.items() if kind == model and not gone}
+            # Rows removed since (and tombstoned by a parent) simply don't come back
+            data[name] = serializer_class(queryset(ids, group_ids), many=True).data if ids else []
+            deleted[name] = sorted(object_id for (kind, object_id), gone in latest.items() if kind == model and gone)
+
+        balances = {group_id: [] for group_id in sorted(balance_groups & group_ids)}
+        if balances:
+            rows = Balance.objects.filter(group_id__in=balances).filter(
+                Q(from_user=user) | Q(to_user=user)
+            ).select_related('from_user', 'to_user')
+            for balance in rows:
+                balances[balance.group_id].append(BalanceSerializer(balance).data)
+        data['balances'] = balances
+        data['deleted'] = deleted
+        return Response(data)
+
+
+class AnalyticsView(APIView):
+    """What the user paid and consumed across all their groups, per group and per month"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(analytics.user_analytics(request.user))
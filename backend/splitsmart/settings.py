@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -55,6 +57,25 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# API-only deployments (the serverless build in vercel.json) serve nothing but /api/:
+# DRF authenticates every request with a Firebase token itself, so the admin, sessions,
+# messages and static files apps and the middleware that serves them are left out
+API_ONLY = config('API_ONLY', default=False, cast=bool)
+if API_ONLY:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in (
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+    )]
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    )]
+
 ROOT_URLCONF = 'splitsmart.urls'
 
 TEMPLATES = [
@@ -73,16 +94,107 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'splitsmart.wsgi.application'
+# Async deployments (e.g. uvicorn splitsmart.asgi:application) can point dashboards at /api/async/
+ASGI_APPLICATION = 'splitsmart.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# DATABASE_PROFILE picks the layout:
+#   'sqlite'          one file (the default)
+#   'sqlite-replica'  a second file stands in for a read replica, to try the router locally;
+#                     copy db.sqlite3 to db-replica.sqlite3 to "replicate"
+#   'postgres'        DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT, plus DB_REPLICA_HOST for a replica
+# Reads from the read endpoints go to 'replica' when it exists, see api/routers.py.
+DATABASE_PROFILE = config('DATABASE_PROFILE', default='sqlite')
+# Where the SQLite files live; serverless filesystems are only writable under /tmp
+SQLITE_DIR = Path(config('SQLITE_DIR', default=str(BASE_DIR)))
+
+
+def sqlite_database(name):
+    return {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': SQLITE_DIR / name,
+        # Keep connections open between requests instead of reconnecting every time
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # WAL lets readers run alongside the writer; IMMEDIATE takes the write
+            # lock up front instead of failing to upgrade a read lock mid-transaction
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
+
+
+def postgres_database(host):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('DB_NAME', default='splitsmart'),
+        'USER': config('DB_USER', default='splitsmart'),
+        'PASSWORD': config('DB_PASSWORD', default=''),
+        'HOST': host,
+        'PORT': config('DB_PORT', default='5432'),
+        # psycopg's connection pool; persistent connections (CONN_MAX_AGE) can't be combined with it
+        'OPTIONS': {'pool': {'min_size': 2, 'max_size': config('DB_POOL_SIZE', default=10, cast=int)}},
+    }
+
+
+if DATABASE_PROFILE == 'postgres':
+    DATABASES = {'default': postgres_database(config('DB_HOST', default='localhost'))}
+    if config('DB_REPLICA_HOST', default=''):
+        DATABASES['replica'] = postgres_database(config('DB_REPLICA_HOST'))
+else:
+    DATABASES = {'default': sqlite_database('db.sqlite3')}
+    if DATABASE_PROFILE == 'sqlite-replica':
+        DATABASES['replica'] = sqlite_database('db-replica.sqlite3')
+
+if 'replica' in DATABASES:
+    # Tests run against one database, with the replica alias reading from it
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+# Seconds a user who wrote keeps reading from the primary, to cover replication lag.
+# The pin is kept in the 'responses' cache (below), which has to be shared by every worker.
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# 'responses' holds serialized group-scoped reads keyed by group versions (api/etags.py).
+# RESPONSE_CACHE: 'locmem' (per process, bounded by RESPONSE_CACHE_MAX_BYTES), 'file' to
+# share between workers on one host, or a redis:// URL to share between hosts.
+RESPONSE_CACHE = config('RESPONSE_CACHE', default='locmem')
+RESPONSE_CACHES = {
+    'locmem': {
+        'BACKEND': 'api.cache.SizedLocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'MAX_BYTES': config('RESPONSE_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int),
+        },
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('RESPONSE_CACHE_DIR', default=os.path.join(BASE_DIR, 'response_cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+if DATABASE_PROFILE == 'postgres' and 'replica' in DATABASES and RESPONSE_CACHE == 'locmem':
+    # A user's next request may land on another worker, which wouldn't know to
+    # keep them off the lagging replica
+    raise ImproperlyConfigured('A read replica needs a shared RESPONSE_CACHE (file or redis://)')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': RESPONSE_CACHES.get(RESPONSE_CACHE) or {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': RESPONSE_CACHE,
+    },
 }
 
 
@@ -111,11 +223,54 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        # ?format=compact: users sideloaded once per response, see api/renderers.py
+        'api.renderers.CompactJSONRenderer',
+    ] + ([] if API_ONLY else ['rest_framework.renderers.BrowsableAPIRenderer']),
 }
 
 # Firebase config - create a service account key in Firebase console and save as firebase-key.json
 FIREBASE_CONFIG = os.path.join(BASE_DIR, 'firebase-key.json')
 
+# Callable that verifies an ID token and returns its claims; tests swap in a local stand-in
+FIREBASE_TOKEN_VERIFIER = 'api.authentication.verify_firebase_token'
+# Verified tokens kept in memory per process until they expire
+FIREBASE_TOKEN_CACHE_SIZE = 1024
+# Fetch Google's signing certificates in the background at startup
+FIREBASE_PREFETCH_CERTIFICATES = not DEBUG
+# Recent username/email -> user id mappings kept per process, see api/directory.py
+USER_DIRECTORY_CACHE_SIZE = 4096
+# Who runs background jobs (api/jobs.py): 'inline' in the request, 'thread' after it,
+# or 'worker' for `manage.py run_worker`. Serverless deployments have no worker.
+JOBS_EXECUTION = config('JOBS_EXECUTION', default='inline')
+# Seconds before a job left running by a dead worker is queued again
+JOBS_LOCK_TIMEOUT = 600
+# Uploads waiting for a background import; workers must see the same directory
+JOBS_STORAGE_DIR = config('JOBS_STORAGE_DIR', default=os.path.join(BASE_DIR, 'job_files'))
+
+
+# Request instrumentation - see api/instrumentation.py
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# /api/metrics/ answers 404 until this is set, then requires a matching X-Metrics-Token header
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Fraction of requests logged with their query count and timings
+REQUEST_LOG_SAMPLE_RATE = config('REQUEST_LOG_SAMPLE_RATE', default=0.0, cast=float)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': config('API_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -1,32 +1,25 @@
 import React, { useState, useEffect, Fragment } from 'react';
 import {
-  Typography, Card, CardContent, Grid, CircularProgress,
+  Typography, Grid, CircularProgress,
   List, ListItem, ListItemText, Divider, Box, Paper
 } from '@mui/material';
 import { balanceApi } from '../services/api';
 import { useAuth } from '../contexts/AuthContext';
 
-interface Balance {
-  id: number;
-  from_user: {
+interface Counterparty {
+  user: {
     id: number;
     username: string;
     email: string;
     first_name: string;
     last_name: string;
   };
-  to_user: {
-    id: number;
-    username: string;
-    email: string;
-    first_name: string;
-    last_name: string;
-  };
-  amount: number;
+  // What they owe the current user, negative when the current user owes them
+  net: number;
 }
 
 const BalanceList: React.FC = () => {
-  const [balances, setBalances] = useState<Balance[]>([]);
+  const [counterparties, setCounterparties] = useState<Counterparty[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const { currentUser } = useAuth();
@@ -38,21 +31,13 @@ const BalanceList: React.FC = () => {
   const fetchBalances = async () => {
     try {
       setLoading(true);
-      const response = await balanceApi.getBalances();
-      
-      // Debug logging
-      console.log("Current user:", currentUser);
-      console.log("Raw balances data:", response.data);
-      
-      // sanitize amount → number
-      const sanitized = response.data.map((b: Balance) => ({
-        ...b,
-        amount: typeof b.amount === 'string'
-          ? parseFloat(b.amount)
-          : b.amount
-      }));
-      
-      setBalances(sanitized);
+      const response = await balanceApi.getSummary();
+
+      // sanitize net → number
+      setCounterparties(response.data.counterparties.map((c: Counterparty) => ({
+        ...c,
+        net: typeof c.net === 'string' ? parseFloat(c.net) : c.net
+      })));
     } catch (err) {
       console.error("Balance API error:", err);
       setError('Failed to fetch balances');
@@ -61,41 +46,35 @@ const BalanceList: React.FC = () => {
     }
   };
 
-  useEffect(() => {
-    if (balances.length > 0 && currentUser) {
-      console.log("All balances after loading:", balances);
-      console.log("Current user email:", currentUser.email);
-      
-      // Check which balances match our user
-      const matchingFromUsername = balances.filter(b => b.from_user.username === currentUser.email);
-      const matchingToUsername = balances.filter(b => b.to_user.username === currentUser.email);
-      const matchingFromEmail = balances.filter(b => b.from_user.email === currentUser.email);
-      const matchingToEmail = balances.filter(b => b.to_user.email === currentUser.email);
-      
-      console.log("Matching by from_user.username:", matchingFromUsername);
-      console.log("Matching by to_user.username:", matchingToUsername);
-      console.log("Matching by from_user.email:", matchingFromEmail);
-      console.log("Matching by to_user.email:", matchingToEmail);
-    }
-  }, [balances, currentUser]);
-
   if (loading) return <CircularProgress />;
   if (error) return <Typography color="error">{error}</Typography>;
 
   // Make sure we have a current user
   if (!currentUser) return <Typography>Please log in to see balances</Typography>;
 
-  const currentUserEmail = currentUser.email;
-  
-  // Try to match the user by both username and email
-  const iOwe = balances.filter(b => 
-    b.from_user.username === currentUserEmail || 
-    b.from_user.email === currentUserEmail
-  );
+  const iOwe = counterparties.filter(c => c.net < 0);
+  const othersOweMe = counterparties.filter(c => c.net > 0);
 
-  const othersOweMe = balances.filter(b => 
-    b.to_user.username === currentUserEmail || 
-    b.to_user.email === currentUserEmail
+  const renderList = (entries: Counterparty[], empty: string) => (
+    <List>
+      {entries.length === 0 ? (
+        <ListItem>
+          <ListItemText primary={empty} />
+        </ListItem>
+      ) : (
+        entries.map(c => (
+          <Fragment key={c.user.id}>
+            <ListItem>
+              <ListItemText
+                primary={`${c.user.first_name || c.user.username} ${c.user.last_name || ''}`}
+                secondary={`$${Math.abs(c.net).toFixed(2)}`}
+              />
+            </ListItem>
+            <Divider />
+          </Fragment>
+        ))
+      )}
+    </List>
   );
 
   return (
@@ -108,25 +87,7 @@ const BalanceList: React.FC = () => {
             <Box sx={{ p: 2, bgcolor: 'error.light' }}>
               <Typography variant="h6">I Owe</Typography>
             </Box>
-            <List>
-              {iOwe.length === 0 ? (
-                <ListItem>
-                  <ListItemText primary="You don't owe anyone" />
-                </ListItem>
-              ) : (
-                iOwe.map(b => (
-                  <Fragment key={b.id}>
-                    <ListItem>
-                      <ListItemText
-                        primary={`${b.to_user.first_name || b.to_user.username} ${b.to_user.last_name || ''}`}
-                        secondary={`$${b.amount.toFixed(2)}`}
-                      />
-                    </ListItem>
-                    <Divider />
-                  </Fragment>
-                ))
-              )}
-            </List>
+            {renderList(iOwe, "You don't owe anyone")}
           </Paper>
         </Grid>
         
@@ -135,25 +96,7 @@ const BalanceList: React.FC = () => {
             <Box sx={{ p: 2, bgcolor: 'success.light' }}>
               <Typography variant="h6">Others Owe Me</Typography>
             </Box>
-            <List>
-              {othersOweMe.length === 0 ? (
-                <ListItem>
-                  <ListItemText primary="No one owes you" />
-                </ListItem>
-              ) : (
-                othersOweMe.map(b => (
-                  <Fragment key={b.id}>
-                    <ListItem>
-                      <ListItemText
-                        primary={`${b.from_user.first_name || b.from_user.username} ${b.from_user.last_name || ''}`}
-                        secondary={`$${b.amount.toFixed(2)}`}
-                      />
-                    </ListItem>
-                    <Divider />
-                  </Fragment>
-                ))
-              )}
-            </List>
+            {renderList(othersOweMe, "No one owes you")}
           </Paper>
         </Grid>
       </Grid>
@@ -161,4 +104,4 @@ const BalanceList: React.FC = () => {
   );
 };
 
-export default BalanceList;
\ No newline at end of file
+export default BalanceList;
@@ -32,6 +32,12 @@ interface User {
   email: string;
 }
 
+// Instances are fetched a page at a time, newest first
+const PAGE_SIZE = 20;
+
+// The cursor of a page link such as /api/instances/?cursor=...&page_size=20
+const cursorFrom = (url: string | null) => (url ? new URL(url).searchParams.get('cursor') : null);
+
 // Add a new interface for edit item state
 interface EditItemState {
   id: number;
@@ -46,6 +52,9 @@ const InstanceList: React.FC = () => {
   const [groups, setGroups] = useState<Group[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  // '' shows every group's instances
+  const [groupFilter, setGroupFilter] = useState<string>('');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
 
   // State for creating a new instance (shopping trip)
   const [openInstanceDialog, setOpenInstanceDialog] = useState(false);
@@ -72,19 +81,27 @@ const InstanceList: React.FC = () => {
   const [openDeleteDialog, setOpenDeleteDialog] = useState(false);
   const [instanceToDelete, setInstanceToDelete] = useState<Instance | null>(null);
 
-  // Fetch instance list and groups on mount.
+  // Fetch the first page of instances and the groups on mount and when the group filter changes.
   useEffect(() => {
     fetchData();
-  }, []);
+  }, [groupFilter]);
+
+  const fetchInstances = (cursor?: string) =>
+    instanceApi.getInstances({
+      page_size: PAGE_SIZE,
+      group: groupFilter || undefined,
+      cursor,
+    });
 
   const fetchData = async () => {
     try {
       setLoading(true);
       const [instancesResponse, groupsResponse] = await Promise.all([
-        instanceApi.getInstances(),
+        fetchInstances(),
         groupApi.getGroups()
       ]);
-      setInstances(instancesResponse.data);
+      setInstances(instancesResponse.data.results);
+      setNextCursor(cursorFrom(instancesResponse.data.next));
       setGroups(groupsResponse.data);
     } catch (error) {
       console.error(error);
@@ -94,6 +111,18 @@ const InstanceList: React.FC = () => {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      const response = await fetchInstances(nextCursor);
+      setInstances((loaded) => [...loaded, ...response.data.results]);
+      setNextCursor(cursorFrom(response.data.next));
+    } catch (error) {
+      console.error(error);
+      setError('Failed to fetch more trips');
+    }
+  };
+
   // --- New Instance (Shopping Trip) Dialog Handlers ---
   const handleOpenInstanceDialog = () => {
     setOpenInstanceDialog(true);
@@ -293,13 +322,31 @@ const InstanceList: React.FC = () => {
       {/* Instance (Shopping Trip) List */}
       <Box sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', mb: 3 }}>
         <Typography variant="h4">Shopping Instances</Typography>
-        <Button 
-          variant="contained" 
-          startIcon={<AddIcon />}
-          onClick={handleOpenInstanceDialog}
-        >
-          New Shopping Trip
-        </Button>
+        <Box sx={{ display: 'flex', gap: 2, alignItems: 'center' }}>
+          <FormControl size="small" sx={{ minWidth: 180 }}>
+            <InputLabel id="group-filter-label">Group</InputLabel>
+            <Select
+              labelId="group-filter-label"
+              value={groupFilter}
+              label="Group"
+              onChange={(e) => setGroupFilter(e.target.value as string)}
+            >
+              <MenuItem value="">All groups</MenuItem>
+              {groups.map((group) => (
+                <MenuItem key={group.id} value={group.id.toString()}>
+                  {group.name}
+                </MenuItem>
+              ))}
+            </Select>
+          </FormControl>
+          <Button 
+            variant="contained" 
+            startIcon={<AddIcon />}
+            onClick={handleOpenInstanceDialog}
+          >
+            New Shopping Trip
+          </Button>
+        </Box>
       </Box>
 
       {instances.length === 0 ? (
@@ -339,6 +386,11 @@ const InstanceList: React.FC = () => {
           ))}
         </Grid>
       )}
+      {nextCursor && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 3 }}>
+          <Button onClick={handleLoadMore}>Load more</Button>
+        </Box>
+      )}
 
       {/* Create New Instance Dialog */}
       <Dialog open={openInstanceDialog} onClose={handleCloseInstanceDialog}>
@@ -40,6 +40,19 @@ api.interceptors.response.use((response) => {
   return Promise.reject(error);
 });
 
+// Optional server-side filters and keyset pagination for list endpoints.
+// Passing page_size switches the response to { next, previous, results }.
+export interface ListParams {
+  group?: number | string;
+  created_by?: number | string;
+  date_after?: string;
+  date_before?: string;
+  page_size?: number;
+  cursor?: string;
+  // 'compact' returns { data, users }: users appear as ids in data and once in users
+  format?: 'compact';
+}
+
 export const groupApi = {
   getGroups: () => api.get('/groups/'),
   getGroup: (id: string) => api.get(`/groups/${id}/`),
@@ -49,10 +62,20 @@ export const groupApi = {
   leaveGroup: (groupId: string) => api.post(`/groups/${groupId}/leave_group/`),
   addMember: (groupId: string, email: string) =>
     api.post(`/groups/${groupId}/add_member/`, { email }),
+  getAnalytics: (groupId: string) => api.get(`/groups/${groupId}/analytics/`),
+  exportLedger: (groupId: string, type: 'csv' | 'ndjson' = 'csv') =>
+    api.get(`/groups/${groupId}/export/`, { params: { type }, responseType: 'blob' }),
+  importExpenses: (groupId: string, file: File, dryRun = false, background = false) => {
+    const form = new FormData();
+    form.append('file', file);
+    form.append('dry_run', String(dryRun));
+    form.append('background', String(background));
+    return api.post(`/groups/${groupId}/import/`, form, { headers: { 'Content-Type': 'multipart/form-data' } });
+  },
 };
   
 export const instanceApi = {
-  getInstances: () => api.get('/instances/'),
+  getInstances: (params?: ListParams) => api.get('/instances/', { params }),
   getInstance: (id: string) => api.get(`/instances/${id}/`),
   createInstance: (data: any) => api.post('/instances/', data),
   updateInstance: (id: string, data: any) => api.put(`/instances/${id}/`, data),
@@ -60,7 +83,7 @@ export const instanceApi = {
 };
 
 export const itemApi = {
-  getItems: () => api.get('/items/'),
+  getItems: (params?: ListParams) => api.get('/items/', { params }),
   getItem: (id: string) => api.get(`/items/${id}/`),
   createItem: (data: any) => {
     console.log('Creating item with data:', data);
@@ -71,7 +94,26 @@ export const itemApi = {
 };
 
 export const balanceApi = {
-  getBalances: () => api.get('/balances/'),
+  getBalances: (params?: Pick<ListParams, 'group' | 'page_size' | 'cursor'>) =>
+    api.get('/balances/', { params }),
+  // Net per counterparty and per group, aggregated on the server
+  getSummary: () => api.get('/balances/summary/'),
+};
+
+export const syncApi = {
+  // Without `since` only the current cursor comes back
+  getChanges: (since?: number, limit?: number) =>
+    api.get('/sync/', { params: { since, limit } }),
+};
+
+export const analyticsApi = {
+  // The current user's spending across all their groups
+  getMine: () => api.get('/analytics/'),
+};
+
+export const jobApi = {
+  // Background imports and cleanups; poll until status is succeeded or failed
+  getJob: (id: number) => api.get(`/jobs/${id}/`),
 };
 
 export default api;
\ No newline at end of file